@@ -1,16 +1,91 @@
+import asyncio
 import time
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 import logging
 
 from models.document import ProcessedDocument, DocumentType
 from utils.pdf_parser import pdf_parser
 from utils.text_processor import text_processor
+from utils.llm_cache import llm_cache
+from utils.keyword_matcher import KeywordMatcher
 from services.modern_gemini_service import get_modern_gemini_service
 
 logger = logging.getLogger(__name__)
 
+# Bump when the classification prompt changes so stale cache entries are ignored
+CLASSIFY_PROMPT_VERSION = "clf_v2"
+
+# Document type is evident from the preamble and the closing (signatures, governing law),
+# so classification only sees the head and tail of long documents. The services' classify_document
+# keeps the first CLASSIFY_EXCERPT_CHARS characters, so the whole excerpt must fit inside that
+CLASSIFY_EXCERPT_CHARS = 4000
+CLASSIFY_HEAD_CHARS = 3000
+CLASSIFY_EXCERPT_SEPARATOR = "\n...\n"
+CLASSIFY_TAIL_CHARS = CLASSIFY_EXCERPT_CHARS - CLASSIFY_HEAD_CHARS - len(CLASSIFY_EXCERPT_SEPARATOR)
+
+# High-signal phrases per document type, used to classify obvious documents without Gemini
+DOCUMENT_TYPE_KEYWORDS = {
+    DocumentType.RENTAL_AGREEMENT: ["landlord", "tenant", "lease agreement", "rental agreement", "security deposit", "monthly rent", "premises"],
+    DocumentType.EMPLOYMENT_CONTRACT: ["employment agreement", "employment contract", "employer", "employee", "salary", "job title", "probationary period"],
+    DocumentType.LOAN_AGREEMENT: ["loan agreement", "borrower", "lender", "principal amount", "interest rate", "repayment", "promissory note"],
+    DocumentType.TERMS_OF_SERVICE: ["terms of service", "terms of use", "acceptable use", "user content", "your account"],
+    DocumentType.PRIVACY_POLICY: ["privacy policy", "personal data", "personal information", "cookies", "data controller", "opt out"],
+    DocumentType.PURCHASE_AGREEMENT: ["purchase agreement", "purchase price", "buyer", "seller", "closing date", "bill of sale"],
+}
+DOCUMENT_TYPE_MATCHER = KeywordMatcher({
+    keyword: document_type
+    for document_type, keywords in DOCUMENT_TYPE_KEYWORDS.items()
+    for keyword in keywords
+})
+KEYWORD_CLASSIFY_CHARS = 8000
+KEYWORD_CLASSIFY_MIN_HITS = 5
+
+# Large PDFs are split into page ranges that are extracted in parallel
+PDF_PARALLEL_MIN_PAGES = 32
+PDF_PAGES_PER_TASK = 16
+
+# Worker processes for CPU-bound text extraction, created on first use
+_extraction_pool = None
+
+def _get_extraction_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool used for text extraction"""
+    global _extraction_pool
+    if _extraction_pool is None:
+        max_workers = int(os.getenv("DOC_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+        _extraction_pool = ProcessPoolExecutor(max_workers=max_workers)
+    return _extraction_pool
+
+def shutdown_extraction_pool():
+    """Stop the text extraction worker processes, if any were started"""
+    global _extraction_pool
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown()
+        _extraction_pool = None
+
+def _extract_and_clean(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    """Extract and clean document text (top-level so it can run in a worker process)"""
+    file_extension = Path(file_path).suffix.lower()
+    
+    # Extract text based on file type
+    if file_extension == '.pdf':
+        extracted_text, metadata = pdf_parser.extract_text(file_path)
+    elif file_extension == '.docx':
+        extracted_text, metadata = text_processor.extract_text_from_docx(file_path)
+    elif file_extension == '.txt':
+        extracted_text, metadata = text_processor.extract_text_from_txt(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+    
+    # Clean the extracted text
+    return text_processor.clean_text(extracted_text), metadata
+
+def _extract_pdf_pages(file_path: str, start_page: int, end_page: int) -> str:
+    """Extract a PDF page range (top-level so it can run in a worker process)"""
+    return pdf_parser.extract_text_pages(file_path, start_page, end_page)
+
 class DocumentProcessorAgent:
     def __init__(self):
         self.gemini_service = get_modern_gemini_service()
@@ -25,40 +100,32 @@ class DocumentProcessorAgent:
             # Determine file type
             file_extension = Path(file_path).suffix.lower()
             
-            # Extract text based on file type
+            # Extract and clean text in worker processes so parsing scales across cores;
+            # plain text is cheap to read, so it stays in a thread instead of paying for the process hop
             if file_extension == '.pdf':
-                extracted_text, metadata = pdf_parser.extract_text(file_path)
-            elif file_extension == '.docx':
-                extracted_text, metadata = text_processor.extract_text_from_docx(file_path)
+                cleaned_text, metadata = await self._extract_pdf_parallel(file_path)
             elif file_extension == '.txt':
-                extracted_text, metadata = text_processor.extract_text_from_txt(file_path)
+                cleaned_text, metadata = await asyncio.to_thread(_extract_and_clean, file_path)
             else:
-                raise ValueError(f"Unsupported file type: {file_extension}")
-            
-            # Clean the extracted text
-            cleaned_text = text_processor.clean_text(extracted_text)
+                loop = asyncio.get_running_loop()
+                cleaned_text, metadata = await loop.run_in_executor(
+                    _get_extraction_pool(), _extract_and_clean, file_path
+                )
             
             if not cleaned_text.strip():
                 raise ValueError("No text could be extracted from the document")
             
-            # Classify document type using Gemini
-            document_type = await self._classify_document_type(cleaned_text)
-            
-            # Chunk the text for processing
-            chunks = text_processor.chunk_text(cleaned_text)
+            # Classify with Gemini while chunking, word counting and page counting run in threads,
+            # so the CPU work is hidden under the network round-trip
+            document_type, (chunks, chunks_total_chars), word_count, page_count = await asyncio.gather(
+                self._classify_document(cleaned_text),
+                asyncio.to_thread(text_processor.chunk_text_with_stats, cleaned_text),
+                asyncio.to_thread(text_processor.get_word_count, cleaned_text),
+                self._get_page_count(file_path, file_extension, metadata)
+            )
             
-            # Calculate additional metadata
-            word_count = text_processor.get_word_count(cleaned_text)
             processing_time = time.time() - start_time
             
-            # Get page count if available
-            page_count = metadata.get("page_count", 0)
-            if page_count == 0 and file_extension == '.pdf':
-                try:
-                    page_count = pdf_parser.get_page_count(file_path)
-                except Exception:
-                    page_count = 0
-            
             # Create processed document
             processed_doc = ProcessedDocument(
                 document_id=document_id,
@@ -69,7 +136,8 @@ class DocumentProcessorAgent:
                     **metadata,
                     "file_path": file_path,
                     "file_extension": file_extension,
-                    "chunks_count": len(chunks)
+                    "chunks_count": len(chunks),
+                    "chunks_total_chars": chunks_total_chars
                 },
                 processing_time=processing_time,
                 word_count=word_count,
@@ -91,28 +159,125 @@ class DocumentProcessorAgent:
             logger.error(f"Document processing failed: {str(e)}")
             raise
     
+    async def _extract_pdf_parallel(self, file_path: str) -> Tuple[str, Dict[str, Any]]:
+        """Extract PDF text, splitting large documents into page ranges processed in parallel"""
+        loop = asyncio.get_running_loop()
+        pool = _get_extraction_pool()
+        
+        try:
+            metadata = await asyncio.to_thread(pdf_parser.get_metadata, file_path)
+            page_count = metadata.get("page_count", 0)
+            
+            if page_count >= PDF_PARALLEL_MIN_PAGES:
+                page_ranges = [
+                    (start, min(start + PDF_PAGES_PER_TASK, page_count))
+                    for start in range(0, page_count, PDF_PAGES_PER_TASK)
+                ]
+                page_texts = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _extract_pdf_pages, file_path, start, end)
+                    for start, end in page_ranges
+                ))
+                
+                extracted_text = "".join(page_texts)
+                if extracted_text.strip():
+                    logger.info(f"Extracted {page_count} PDF pages in {len(page_ranges)} parallel ranges")
+                    cleaned_text = await asyncio.to_thread(text_processor.clean_text, extracted_text)
+                    return cleaned_text, metadata
+        except Exception as e:
+            logger.warning(f"Parallel PDF extraction failed, using sequential extraction: {str(e)}")
+        
+        # Small PDFs, or no text from pdfplumber: full extraction with PyPDF2 fallback
+        return await loop.run_in_executor(pool, _extract_and_clean, file_path)
+    
+    async def _get_page_count(self, file_path: str, file_extension: str, metadata: Dict[str, Any]) -> int:
+        """Get page count from extraction metadata, falling back to reading the PDF"""
+        page_count = metadata.get("page_count", 0)
+        if page_count == 0 and file_extension == '.pdf':
+            try:
+                page_count = await asyncio.to_thread(pdf_parser.get_page_count, file_path)
+            except Exception:
+                page_count = 0
+        return page_count
+    
+    async def _classify_document(self, text: str) -> DocumentType:
+        """Classify by keywords when the signal is clear, otherwise ask Gemini"""
+        document_type = self._classify_by_keywords(text)
+        if document_type is not None:
+            logger.info(f"Document classified as: {document_type.value} (keyword match)")
+            return document_type
+        
+        return await self._classify_document_type(self._get_classification_excerpt(text))
+    
+    def _classify_by_keywords(self, text: str) -> Optional[DocumentType]:
+        """Classify from keyword hits if one type clearly dominates"""
+        type_hits = DOCUMENT_TYPE_MATCHER.count_labels(text[:KEYWORD_CLASSIFY_CHARS].lower())
+        ranked = type_hits.most_common(2)
+        if not ranked:
+            return None
+        
+        top_type, top_hits = ranked[0]
+        runner_up_hits = ranked[1][1] if len(ranked) > 1 else 0
+        
+        # Require enough evidence and a clear margin over the next candidate
+        if top_hits >= KEYWORD_CLASSIFY_MIN_HITS and top_hits >= 2 * runner_up_hits:
+            return top_type
+        
+        return None
+    
+    def _get_classification_excerpt(self, text: str) -> str:
+        """Get the head and tail of a document for type classification"""
+        if len(text) <= CLASSIFY_EXCERPT_CHARS:
+            return text
+        return f"{text[:CLASSIFY_HEAD_CHARS]}{CLASSIFY_EXCERPT_SEPARATOR}{text[-CLASSIFY_TAIL_CHARS:]}"
+    
     async def _classify_document_type(self, text: str) -> DocumentType:
         """Classify the type of legal document using Gemini"""
+        text_hash = llm_cache.hash_text(text)
+        cache_version = f"{self.gemini_service.model_name}:{CLASSIFY_PROMPT_VERSION}"
+        
+        cached_type = llm_cache.check(text_hash, cache_version)
+        if cached_type is not None:
+            try:
+                document_type = DocumentType(cached_type)
+                logger.info(f"Document classified as: {document_type.value} (cached)")
+                return document_type
+            except ValueError:
+                logger.warning(f"Ignoring invalid cached document type: {cached_type}")
+        
         document_type = await self.gemini_service.classify_document(text)
+        llm_cache.save(text_hash, cache_version, document_type.value)
         logger.info(f"Document classified as: {document_type.value}")
         return document_type
     
     
     def get_document_stats(self, processed_doc: ProcessedDocument) -> Dict[str, Any]:
         """Get statistics about the processed document"""
+        # Chunks may have been dropped after processing, so prefer the recorded count
+        chunk_count = processed_doc.metadata.get("chunks_count", len(processed_doc.chunks))
         return {
             "document_id": processed_doc.document_id,
             "document_type": processed_doc.document_type.value,
             "word_count": processed_doc.word_count,
             "page_count": processed_doc.page_count,
-            "chunk_count": len(processed_doc.chunks),
+            "chunk_count": chunk_count,
             "processing_time": processed_doc.processing_time,
-            "average_chunk_size": sum(len(chunk) for chunk in processed_doc.chunks) / len(processed_doc.chunks) if processed_doc.chunks else 0,
+            "average_chunk_size": self._get_chunks_total_chars(processed_doc) / chunk_count if chunk_count else 0,
             "text_length": len(processed_doc.extracted_text)
         }
     
-    def validate_document(self, file_path: str) -> Dict[str, Any]:
+    def _get_chunks_total_chars(self, processed_doc: ProcessedDocument) -> int:
+        """Get total chunk size recorded during chunking, computing it for older documents"""
+        total_chars = processed_doc.metadata.get("chunks_total_chars")
+        if total_chars is None:
+            total_chars = sum(len(chunk) for chunk in processed_doc.chunks)
+        return total_chars
+    
+    async def validate_document(self, file_path: str) -> Dict[str, Any]:
         """Validate document before processing"""
+        return await asyncio.to_thread(self._validate_file, file_path)
+    
+    def _validate_file(self, file_path: str) -> Dict[str, Any]:
+        """Run blocking file checks for validate_document"""
         validation_result = {
             "valid": True,
             "errors": [],
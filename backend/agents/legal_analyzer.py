@@ -1,15 +1,76 @@
 import asyncio
+import random
+import re
 import uuid
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 
+try:
+    from datasketch import MinHash, MinHashLSH
+    DATASKETCH_AVAILABLE = True
+except ImportError:
+    DATASKETCH_AVAILABLE = False
+    MinHash = None
+    MinHashLSH = None
+
 from models.document import ProcessedDocument, LegalClause, ClauseType
 from services.modern_gemini_service import get_modern_gemini_service
 from utils.text_processor import text_processor
+from utils.llm_cache import llm_cache
+from utils.rate_limiter import llm_rate_limiter, is_rate_limit_error
+from utils.clause_table import ClauseTable
 
 logger = logging.getLogger(__name__)
 
+# Bump when the clause analysis prompt changes so stale cache entries are ignored
+ANALYZE_PROMPT_VERSION = "analyze_v1"
+
+# Potential clauses sent to Gemini in one analysis request
+CLAUSES_PER_REQUEST = 5
+
+# Upper bound on a single clause analysis request, in seconds
+CLAUSE_REQUEST_TIMEOUT = 60
+
+# Retries after a rate-limit response, with exponential backoff shared by all in-flight requests
+RATE_LIMIT_MAX_RETRIES = 4
+RATE_LIMIT_BASE_DELAY = 2.0
+
+# Near-duplicate detection settings
+DUPLICATE_SIMILARITY_THRESHOLD = 0.9
+MINHASH_NUM_PERM = 128
+
+# Importance score per clause type (higher = more important), used as a sort tie-breaker
+CLAUSE_IMPORTANCE_SCORES = {
+    ClauseType.LIABILITY: 10,
+    ClauseType.PAYMENT_TERMS: 9,
+    ClauseType.TERMINATION: 8,
+    ClauseType.INDEMNIFICATION: 7,
+    ClauseType.INTELLECTUAL_PROPERTY: 6,
+    ClauseType.CONFIDENTIALITY: 5,
+    ClauseType.DISPUTE_RESOLUTION: 4,
+    ClauseType.GOVERNING_LAW: 3,
+    ClauseType.AMENDMENT: 2,
+    ClauseType.SEVERABILITY: 1,
+    ClauseType.OTHER: 0
+}
+
+# Common section number patterns, combined into one regex. Every branch is anchored
+# at the start of the line so alternatives keep their priority order: the first
+# branch that matches wins, exactly as when the patterns were tried one by one.
+SECTION_NUMBER_PATTERN = re.compile(
+    r'^(?:'
+    r'(?P<dotted>\d+\.\d*)'            # 1.1, 1.2.3
+    r'|(?P<number>\d+)'                # 1, 2, 3
+    r'|\((?P<paren_number>\d+)\)'      # (1), (2)
+    r'|(?P<letter>[A-Z])\.?\s'         # A., B.
+    r'|\((?P<paren_letter>[a-z])\)'    # (a), (b)
+    r'|.*?Section\s+(?P<section>\d+)'  # Section 1
+    r'|.*?Article\s+(?P<article>\d+)'  # Article 1
+    r')',
+    re.IGNORECASE
+)
+
 class LegalAnalyzerAgent:
     def __init__(self):
         self.gemini_service = get_modern_gemini_service()
@@ -26,41 +87,21 @@ class LegalAnalyzerAgent:
             
             logger.info(f"Found {len(potential_clauses)} potential clauses")
             
-            # Step 2: Analyze each potential clause with Gemini
-            legal_clauses = []
+            # Step 2: Analyze potential clauses with Gemini, several clauses per request.
+            # All batches are started at once; the shared rate limiter caps concurrency,
+            # paces the requests and coordinates backoff when Gemini rate-limits us.
+            tasks = [
+                self._safe_analyze_clause_batch(
+                    potential_clauses[i:i + CLAUSES_PER_REQUEST],
+                    processed_doc.document_id,
+                    i
+                )
+                for i in range(0, len(potential_clauses), CLAUSES_PER_REQUEST)
+            ]
+            batch_results = await asyncio.gather(*tasks)
             
-            # Process clauses in smaller batches for faster processing
-            batch_size = 3  # Reduced from 5 to 3 for faster processing
-            for i in range(0, len(potential_clauses), batch_size):
-                batch = potential_clauses[i:i + batch_size]
-                
-                # Process batch concurrently with timeout
-                tasks = [
-                    self._analyze_single_clause(clause, processed_doc.document_id, idx + i)
-                    for idx, clause in enumerate(batch)
-                ]
-                
-                try:
-                    # Add timeout to prevent hanging
-                    batch_results = await asyncio.wait_for(
-                        asyncio.gather(*tasks, return_exceptions=True),
-                        timeout=60  # 60 second timeout per batch
-                    )
-                    
-                    # Filter successful results
-                    for result in batch_results:
-                        if isinstance(result, LegalClause):
-                            legal_clauses.append(result)
-                        elif isinstance(result, Exception):
-                            logger.warning(f"Clause analysis failed: {str(result)}")
-                            
-                except asyncio.TimeoutError:
-                    logger.error(f"Batch {i//batch_size + 1} timed out after 60 seconds")
-                    # Continue with next batch instead of failing completely
-                
-                # Reduced delay between batches for faster processing
-                if i + batch_size < len(potential_clauses):
-                    await asyncio.sleep(0.5)  # Reduced from 1 second to 0.5 seconds
+            # Failed batches come back empty, so results can be flattened directly
+            legal_clauses = [clause for batch_clauses in batch_results for clause in batch_clauses]
             
             # Step 3: Post-process and validate clauses
             validated_clauses = self._validate_and_filter_clauses(legal_clauses)
@@ -80,67 +121,136 @@ class LegalAnalyzerAgent:
             logger.error(f"Legal analysis failed for {processed_doc.document_id}: {str(e)}")
             raise
     
+    async def _safe_analyze_clause_batch(self, batch: List[Dict[str, Any]], document_id: str, start_index: int) -> List[LegalClause]:
+        """Analyze a batch of clauses, logging failures and returning an empty list instead of raising"""
+        try:
+            return await self._analyze_clause_batch(batch, document_id, start_index)
+        except Exception as e:
+            logger.warning(f"Clause batch analysis failed for clauses {start_index}-{start_index + len(batch) - 1}: {str(e)}")
+            return []
+    
+    async def _analyze_clause_batch(self, batch: List[Dict[str, Any]], document_id: str, start_index: int) -> List[LegalClause]:
+        """Analyze a batch of clauses using a single Gemini request"""
+        cache_version = self._get_analysis_cache_version()
+        text_hashes = [llm_cache.hash_text(clause_info["text"]) for clause_info in batch]
+        analysis_results = [llm_cache.check(text_hash, cache_version) for text_hash in text_hashes]
+        
+        pending = [position for position, result in enumerate(analysis_results) if result is None]
+        if pending:
+            pending_texts = [batch[position]["text"] for position in pending]
+            try:
+                fresh_results = await self._request_with_backoff(
+                    lambda: self.gemini_service.analyze_legal_text_batch(pending_texts)
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Clause batch starting at {start_index} timed out after {CLAUSE_REQUEST_TIMEOUT} seconds")
+                raise
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    # Still throttled after backing off; per-clause requests would only add load
+                    raise
+                # Fall back to one request per clause so a malformed batch response loses nothing
+                logger.warning(f"Batched clause analysis failed, retrying clauses individually: {str(e)}")
+                fresh_results = await asyncio.gather(
+                    *(self._analyze_text_rate_limited(text) for text in pending_texts),
+                    return_exceptions=True
+                )
+            
+            for position, result in zip(pending, fresh_results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Clause analysis failed: {str(result)}")
+                    continue
+                analysis_results[position] = result
+                llm_cache.save(text_hashes[position], cache_version, result)
+        
+        return [
+            self._build_legal_clause(clause_info["text"], analysis_result, document_id, start_index + position)
+            for position, (clause_info, analysis_result) in enumerate(zip(batch, analysis_results))
+            if analysis_result is not None
+        ]
+    
     async def _analyze_single_clause(self, clause_info: Dict[str, Any], document_id: str, clause_index: int) -> LegalClause:
         """Analyze a single clause using Gemini"""
         try:
             clause_text = clause_info["text"]
             
-            # Use Gemini to analyze the clause
-            analysis_result = await self.gemini_service.analyze_legal_text(clause_text)
-            
-            # Create LegalClause object
-            clause_id = f"{document_id}_{clause_index}_{str(uuid.uuid4())[:8]}"
-            
-            # Parse clause type
-            try:
-                clause_type = ClauseType(analysis_result["clause_type"])
-            except ValueError:
-                clause_type = ClauseType.OTHER
-            
-            legal_clause = LegalClause(
-                clause_id=clause_id,
-                clause_type=clause_type,
-                original_text=clause_text,
-                simplified_text=analysis_result.get("simplified_text", ""),
-                risk_score=analysis_result.get("risk_score", 5),
-                risk_explanation=analysis_result.get("risk_explanation", ""),
-                section_number=self._extract_section_number(clause_text),
-                page_number=None,  # Would need page mapping for this
-                key_terms=analysis_result.get("key_terms", []),
-                recommendations=analysis_result.get("recommendations", []),
-                concerns=analysis_result.get("concerns", []),
-                obligations=analysis_result.get("obligations", [])
-            )
+            # Use Gemini to analyze the clause, reusing cached results for repeated boilerplate
+            text_hash = llm_cache.hash_text(clause_text)
+            cache_version = self._get_analysis_cache_version()
+            analysis_result = llm_cache.check(text_hash, cache_version)
+            if analysis_result is None:
+                analysis_result = await self._analyze_text_rate_limited(clause_text)
+                llm_cache.save(text_hash, cache_version, analysis_result)
             
-            return legal_clause
+            return self._build_legal_clause(clause_text, analysis_result, document_id, clause_index)
             
         except Exception as e:
             logger.error(f"Single clause analysis failed: {str(e)}")
             raise
     
-    def _extract_section_number(self, clause_text: str) -> str:
-        """Extract section number from clause text if present"""
-        import re
+    async def _analyze_text_rate_limited(self, clause_text: str) -> Dict[str, Any]:
+        """Analyze one clause with Gemini under the shared rate limiter"""
+        return await self._request_with_backoff(
+            lambda: self.gemini_service.analyze_legal_text(clause_text)
+        )
+    
+    async def _request_with_backoff(self, make_request):
+        """Run a Gemini request under the shared rate limiter, retrying rate-limit errors with backoff.
         
-        # Common section number patterns
-        patterns = [
-            r'^(\d+\.\d*)',  # 1.1, 1.2.3
-            r'^(\d+)',  # 1, 2, 3
-            r'^\((\d+)\)',  # (1), (2)
-            r'^([A-Z])\.?\s',  # A., B.
-            r'^\(([a-z])\)',  # (a), (b)
-            r'Section\s+(\d+)',  # Section 1
-            r'Article\s+(\d+)',  # Article 1
-        ]
+        On a rate-limit error the limiter is paused, so sibling requests wait out the same backoff
+        instead of each hitting the API and failing on their own.
+        """
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            try:
+                async with llm_rate_limiter:
+                    # Timeout applies to the request itself, not to time spent waiting for the limiter
+                    return await asyncio.wait_for(make_request(), timeout=CLAUSE_REQUEST_TIMEOUT)
+            except Exception as e:
+                if attempt == RATE_LIMIT_MAX_RETRIES or not is_rate_limit_error(e):
+                    raise
+                
+                delay = RATE_LIMIT_BASE_DELAY * (2 ** attempt) + random.uniform(0, 1)
+                logger.warning(f"Rate limited by Gemini, backing off {delay:.1f}s (attempt {attempt + 1}/{RATE_LIMIT_MAX_RETRIES})")
+                llm_rate_limiter.pause(delay)
+    
+    def _get_analysis_cache_version(self) -> str:
+        """Get the LLM cache version key for clause analysis"""
+        return f"{self.gemini_service.model_name}:{ANALYZE_PROMPT_VERSION}"
+    
+    def _build_legal_clause(self, clause_text: str, analysis_result: Dict[str, Any], document_id: str, clause_index: int) -> LegalClause:
+        """Create a LegalClause from a Gemini analysis result"""
+        clause_id = f"{document_id}_{clause_index}_{str(uuid.uuid4())[:8]}"
         
-        first_line = clause_text.split('\n')[0].strip()
+        # Parse clause type
+        try:
+            clause_type = ClauseType(analysis_result["clause_type"])
+        except ValueError:
+            clause_type = ClauseType.OTHER
         
-        for pattern in patterns:
-            match = re.search(pattern, first_line, re.IGNORECASE)
-            if match:
-                return match.group(1)
+        return LegalClause(
+            clause_id=clause_id,
+            clause_type=clause_type,
+            original_text=clause_text,
+            simplified_text=analysis_result.get("simplified_text", ""),
+            risk_score=analysis_result.get("risk_score", 5),
+            risk_explanation=analysis_result.get("risk_explanation", ""),
+            section_number=self._extract_section_number(clause_text),
+            page_number=None,  # Would need page mapping for this
+            key_terms=analysis_result.get("key_terms", []),
+            recommendations=analysis_result.get("recommendations", []),
+            concerns=analysis_result.get("concerns", []),
+            obligations=analysis_result.get("obligations", [])
+        )
+    
+    def _extract_section_number(self, clause_text: str) -> Optional[str]:
+        """Extract section number from clause text if present"""
+        first_line = clause_text.split('\n', 1)[0].strip()
         
-        return None
+        match = SECTION_NUMBER_PATTERN.match(first_line)
+        if not match:
+            return None
+        
+        return next((value for value in match.groupdict().values() if value is not None), None)
     
     def _validate_and_filter_clauses(self, clauses: List[LegalClause]) -> List[LegalClause]:
         """Validate and filter clauses based on quality criteria"""
@@ -157,7 +267,7 @@ class LegalAnalyzerAgent:
         validated_clauses = self._remove_duplicate_clauses(validated_clauses)
         
         # Sort by importance (risk score and clause type)
-        validated_clauses.sort(key=lambda x: (x.risk_score, self._get_clause_importance(x.clause_type)), reverse=True)
+        validated_clauses.sort(key=lambda x: (x.risk_score, CLAUSE_IMPORTANCE_SCORES.get(x.clause_type, 0)), reverse=True)
         
         return validated_clauses
     
@@ -176,70 +286,92 @@ class LegalAnalyzerAgent:
             return False
         
         # Must have some meaningful content (not just headers or numbers)
-        text_words = clause.original_text.lower().split()
-        meaningful_words = [word for word in text_words if len(word) > 3 and word.isalpha()]
-        if len(meaningful_words) < 5:
+        if not text_processor.has_meaningful_words(clause.original_text, min_count=5):
             return False
         
         return True
     
     def _remove_duplicate_clauses(self, clauses: List[LegalClause]) -> List[LegalClause]:
         """Remove duplicate or very similar clauses"""
+        if DATASKETCH_AVAILABLE:
+            return self._remove_duplicate_clauses_lsh(clauses)
+        
+        unique_clauses = []
+        # Normalized text -> word set, so each seen clause is tokenized only once
+        seen_word_sets = {}
+        
+        for clause in clauses:
+            # Create a normalized version of the text for comparison, tokenizing only once
+            tokens = clause.text_lower.split()
+            normalized_text = ' '.join(tokens)
+            
+            # Check for exact duplicates
+            if normalized_text in seen_word_sets:
+                continue
+            
+            # Check for very similar clauses (>90% overlap)
+            words = frozenset(tokens)
+            is_duplicate = any(
+                self._calculate_word_set_similarity(words, seen_words) > DUPLICATE_SIMILARITY_THRESHOLD
+                for seen_words in seen_word_sets.values()
+            )
+            
+            if not is_duplicate:
+                unique_clauses.append(clause)
+                seen_word_sets[normalized_text] = words
+        
+        return unique_clauses
+    
+    def _remove_duplicate_clauses_lsh(self, clauses: List[LegalClause]) -> List[LegalClause]:
+        """Remove near-duplicate clauses using MinHash signatures indexed in an LSH"""
         unique_clauses = []
         seen_texts = set()
+        candidate_word_sets = {}
+        lsh = MinHashLSH(threshold=DUPLICATE_SIMILARITY_THRESHOLD, num_perm=MINHASH_NUM_PERM)
         
         for clause in clauses:
-            # Create a normalized version of the text for comparison
-            normalized_text = ' '.join(clause.original_text.lower().split())
+            tokens = clause.text_lower.split()
+            normalized_text = ' '.join(tokens)
             
             # Check for exact duplicates
             if normalized_text in seen_texts:
                 continue
             
-            # Check for very similar clauses (>90% overlap)
-            is_duplicate = False
-            for seen_text in seen_texts:
-                similarity = self._calculate_text_similarity(normalized_text, seen_text)
-                if similarity > 0.9:
-                    is_duplicate = True
-                    break
+            words = frozenset(tokens)
+            minhash = MinHash(num_perm=MINHASH_NUM_PERM)
+            for word in words:
+                minhash.update(word.encode('utf-8'))
+            
+            # LSH candidates are approximate, so confirm with exact word overlap
+            is_duplicate = any(
+                self._calculate_word_set_similarity(words, candidate_word_sets[key]) > DUPLICATE_SIMILARITY_THRESHOLD
+                for key in lsh.query(minhash)
+            )
             
             if not is_duplicate:
                 unique_clauses.append(clause)
                 seen_texts.add(normalized_text)
+                candidate_word_sets[clause.clause_id] = words
+                lsh.insert(clause.clause_id, minhash)
         
         return unique_clauses
     
     def _calculate_text_similarity(self, text1: str, text2: str) -> float:
         """Calculate simple text similarity based on word overlap"""
-        words1 = set(text1.split())
-        words2 = set(text2.split())
-        
+        return self._calculate_word_set_similarity(frozenset(text1.split()), frozenset(text2.split()))
+    
+    def _calculate_word_set_similarity(self, words1: frozenset, words2: frozenset) -> float:
+        """Calculate Jaccard similarity of two pre-tokenized word sets"""
         if not words1 or not words2:
             return 0.0
         
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
-        
-        return len(intersection) / len(union) if union else 0.0
+        # |A ∪ B| = |A| + |B| - |A ∩ B|, so the union set is never built
+        intersection_size = len(words1 & words2)
+        return intersection_size / (len(words1) + len(words2) - intersection_size)
     
     def _get_clause_importance(self, clause_type: ClauseType) -> int:
         """Get importance score for clause type (higher = more important)"""
-        importance_scores = {
-            ClauseType.LIABILITY: 10,
-            ClauseType.PAYMENT_TERMS: 9,
-            ClauseType.TERMINATION: 8,
-            ClauseType.INDEMNIFICATION: 7,
-            ClauseType.INTELLECTUAL_PROPERTY: 6,
-            ClauseType.CONFIDENTIALITY: 5,
-            ClauseType.DISPUTE_RESOLUTION: 4,
-            ClauseType.GOVERNING_LAW: 3,
-            ClauseType.AMENDMENT: 2,
-            ClauseType.SEVERABILITY: 1,
-            ClauseType.OTHER: 0
-        }
-        
-        return importance_scores.get(clause_type, 0)
+        return CLAUSE_IMPORTANCE_SCORES.get(clause_type, 0)
     
     async def analyze_clause_relationships(self, clauses: List[LegalClause]) -> Dict[str, Any]:
         """Analyze relationships between clauses"""
@@ -279,27 +411,15 @@ class LegalAnalyzerAgent:
                 "average_risk_score": 0.0
             }
         
-        # Clause type distribution
-        clause_types = {}
-        for clause in clauses:
-            clause_type = clause.clause_type.value
-            clause_types[clause_type] = clause_types.get(clause_type, 0) + 1
-        
-        # Risk distribution
-        risk_distribution = {
-            "low_risk": len([c for c in clauses if c.risk_score <= 3]),
-            "medium_risk": len([c for c in clauses if 4 <= c.risk_score <= 6]),
-            "high_risk": len([c for c in clauses if c.risk_score >= 7])
-        }
-        
-        # Average risk score
-        avg_risk = sum(c.risk_score for c in clauses) / len(clauses)
+        # Aggregate over packed columns instead of walking the clause objects
+        table = ClauseTable(clauses)
+        clause_types = table.type_counts()
         
         return {
             "total_clauses": len(clauses),
             "clause_types": clause_types,
-            "risk_distribution": risk_distribution,
-            "average_risk_score": round(avg_risk, 2),
-            "highest_risk_clause": max(clauses, key=lambda x: x.risk_score).clause_id,
+            "risk_distribution": table.risk_distribution(),
+            "average_risk_score": round(table.average_risk(), 2),
+            "highest_risk_clause": table.clause_ids[table.highest_risk_index()],
             "most_common_type": max(clause_types, key=clause_types.get) if clause_types else None
         }
\ No newline at end of file
@@ -1,20 +1,97 @@
+import os
 import asyncio
+import json
 import time
 import uuid
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import logging
 from pathlib import Path
 
-from models.document import ProcessingStatus, ProcessedDocument, DocumentType, LegalClause, DocumentSummary
+from models.document import ProcessingStatus, ProcessedDocument, DocumentType, LegalClause, DocumentSummary, split_sentences
 from models.analysis import DocumentAnalysis, QueryResult, RiskCategory, ProcessingStats
 from agents.document_processor import DocumentProcessorAgent
 from agents.legal_analyzer import LegalAnalyzerAgent
 from agents.risk_assessor import RiskAssessorAgent
 from agents.query_handler import QueryHandlerAgent
 from services.modern_gemini_service import get_modern_gemini_service
+from utils.llm_cache import llm_cache
+from utils.keyword_matcher import KeywordMatcher
+from utils.ttl_cache import TTLCache
+from utils.status_bus import status_bus
+from utils.clause_table import ClauseAggregate
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on each document-level Gemini call (summary, explanation, recommendations), in seconds
+LLM_STEP_TIMEOUT = 120
+
+# Upper bound on the whole processing pipeline for one document, in seconds
+DOCUMENT_PROCESSING_TIMEOUT = int(os.getenv("DOCUMENT_PROCESSING_TIMEOUT", 600))
+
+# Bounds on the in-memory document and analysis stores
+DOCUMENT_CACHE_MAX_SIZE = int(os.getenv("DOCUMENT_CACHE_MAX_SIZE", 500))
+DOCUMENT_CACHE_TTL_SECONDS = int(os.getenv("DOCUMENT_CACHE_TTL_SECONDS", 3600))
+
+# Bound on remembered query answers, which expire with the documents they were asked about
+QUERY_CACHE_MAX_SIZE = int(os.getenv("QUERY_CACHE_MAX_SIZE", 1024))
+
+# Documents whose split sentences are kept for follow-up queries; each holds about another copy of
+# the text, so this stays much smaller than the document cache
+SENTENCE_CACHE_MAX_SIZE = int(os.getenv("SENTENCE_CACHE_MAX_SIZE", 32))
+
+# Bump when the summary or explanation prompts change so stale cache entries are ignored
+SUMMARY_PROMPT_VERSION = "summary_v1"
+EXPLANATION_PROMPT_VERSION = "explain_v1"
+
+# Ask for the summary and explanation in one Gemini request instead of two. Saves a request
+# per document, but the summary can no longer start before clause analysis finishes.
+COMBINE_SUMMARY_AND_EXPLANATION = os.getenv("COMBINE_SUMMARY_AND_EXPLANATION", "false").lower() == "true"
+
+# Ask for the recommendations, category descriptions and red flags in one Gemini request
+# instead of one request each (plus one per category). Falls back to the separate requests on failure.
+COMBINE_REPORT_INSIGHTS = os.getenv("COMBINE_REPORT_INSIGHTS", "true").lower() == "true"
+
+# Low-risk documents get a template explanation instead of a Gemini request: one is only
+# requested when some clause reaches EXPLANATION_MIN_CLAUSE_RISK or the average clause risk
+# reaches EXPLANATION_MIN_AVERAGE_RISK. Set both to 0 to always request one.
+EXPLANATION_MIN_CLAUSE_RISK = float(os.getenv("EXPLANATION_MIN_CLAUSE_RISK", 6))
+EXPLANATION_MIN_AVERAGE_RISK = float(os.getenv("EXPLANATION_MIN_AVERAGE_RISK", 4))
+
+# Per-clause limits on the clause data sent with explanation requests
+EXPLANATION_CLAUSE_TEXT_CHARS = 500
+EXPLANATION_CLAUSE_MAX_CONCERNS = 3
+
+# Most template recommendations returned for a document
+MAX_RECOMMENDATIONS = 10
+
+# Most template red flags returned for a document
+MAX_TEMPLATE_RED_FLAGS = 5
+
+# Template descriptions of each risk category
+RISK_DESCRIPTIONS = {
+    "payment_terms": "Financial obligations and payment requirements",
+    "termination": "Conditions and procedures for ending the agreement",
+    "liability": "Responsibility and damage provisions",
+    "confidentiality": "Information protection and non-disclosure requirements",
+    "intellectual_property": "Rights and ownership of intellectual assets",
+    "dispute_resolution": "Methods for resolving conflicts and disagreements",
+    "governing_law": "Legal jurisdiction and applicable laws",
+    "amendment": "Procedures for modifying the agreement",
+    "other": "Other legal provisions and general terms"
+}
+
+# Template red flags and the phrases that trigger them, in reporting order
+RED_FLAG_TERMS = {
+    "Unlimited liability exposure detected": ('unlimited liability', 'unlimited damages', 'no cap on liability'),
+    "One-sided termination rights detected": ('terminate at will', 'terminate without cause', 'immediate termination'),
+    "Non-refundable fees or penalties detected": ('non-refundable', 'forfeiture', 'penalty fee'),
+}
+RED_FLAG_MATCHER = KeywordMatcher({
+    term: message
+    for message, terms in RED_FLAG_TERMS.items()
+    for term in terms
+})
+
 class OrchestratorAgent:
     def __init__(self):
         self.document_processor = DocumentProcessorAgent()
@@ -23,66 +100,113 @@ class OrchestratorAgent:
         self.query_handler = QueryHandlerAgent()
         self.gemini_service = get_modern_gemini_service()
         
-        # Store processed documents and analysis results
-        self.processed_documents: Dict[str, ProcessedDocument] = {}
-        self.analysis_cache: Dict[str, DocumentAnalysis] = {}
+        # Store processed documents and analysis results, bounded by count and age
+        self.processed_documents = TTLCache(DOCUMENT_CACHE_MAX_SIZE, DOCUMENT_CACHE_TTL_SECONDS)
+        self.analysis_cache = TTLCache(DOCUMENT_CACHE_MAX_SIZE, DOCUMENT_CACHE_TTL_SECONDS)
+        
+        # (document_id, normalized query) -> (analysis the answer came from, answer)
+        self.query_cache = TTLCache(QUERY_CACHE_MAX_SIZE, DOCUMENT_CACHE_TTL_SECONDS)
+        
+        # document_id -> (processed document, its sentences with their keywords)
+        self.sentence_cache = TTLCache(SENTENCE_CACHE_MAX_SIZE, DOCUMENT_CACHE_TTL_SECONDS)
+        
+        # Running document and query tasks, shared by concurrent callers asking for the same thing
+        self._inflight: Dict[Tuple[str, ...], asyncio.Future] = {}
     
     async def process_document(self, file_path: str, document_id: str, status_tracker: Dict[str, ProcessingStatus]) -> DocumentAnalysis:
-        """Main document processing workflow"""
+        """Main document processing workflow; concurrent calls for the same document share one run"""
+        return await self._single_flight(
+            ("document", document_id),
+            lambda: self._process_document_with_deadline(file_path, document_id, status_tracker)
+        )
+    
+    async def _process_document_with_deadline(self, file_path: str, document_id: str, status_tracker: Dict[str, ProcessingStatus]) -> DocumentAnalysis:
+        """Run the pipeline, failing with TimeoutError if it runs past DOCUMENT_PROCESSING_TIMEOUT"""
+        # asyncio.wait rather than wait_for, so a step's own LLM_STEP_TIMEOUT surfaces
+        # as that step's error instead of being reported as the document deadline
+        task = asyncio.ensure_future(self._run_document_pipeline(file_path, document_id, status_tracker))
+        try:
+            done, _ = await asyncio.wait({task}, timeout=DOCUMENT_PROCESSING_TIMEOUT)
+        finally:
+            if not task.done():
+                task.cancel()
+        
+        if not done:
+            await asyncio.gather(task, return_exceptions=True)
+            logger.error(f"Document processing timed out for {document_id} after {DOCUMENT_PROCESSING_TIMEOUT} seconds")
+            raise TimeoutError(f"Document processing timed out after {DOCUMENT_PROCESSING_TIMEOUT} seconds")
+        
+        return task.result()
+    
+    async def _run_document_pipeline(self, file_path: str, document_id: str, status_tracker: Dict[str, ProcessingStatus]) -> DocumentAnalysis:
+        """Run the processing steps for one document"""
         start_time = time.time()
+        summary_task = None
         
         try:
             logger.info(f"Starting document processing for {document_id}")
             
             # Step 1: Document Processing (Text Extraction)
-            status_tracker[document_id].current_step = "Extracting text from document"
-            status_tracker[document_id].progress = 20
+            self._update_status(status_tracker, document_id, "Extracting text from document", 20)
             
             processed_doc = await self.document_processor.process_document(file_path, document_id)
+            # Nothing downstream reads the chunks, and they would keep a second copy of the
+            # text alive in the document cache; their count and size stay in the metadata
+            processed_doc.chunks = []
             self.processed_documents[document_id] = processed_doc
             
             logger.info(f"Text extraction completed for {document_id}. Word count: {processed_doc.word_count}")
             
+            # The summary only needs the extracted text, so start it now and let it
+            # run alongside clause analysis and risk assessment
+            if not COMBINE_SUMMARY_AND_EXPLANATION:
+                summary_task = asyncio.create_task(self._generate_document_summary(processed_doc))
+            
             # Step 2: Legal Analysis (Clause Identification)
-            status_tracker[document_id].current_step = "Analyzing legal clauses"
-            status_tracker[document_id].progress = 40
+            self._update_status(status_tracker, document_id, "Analyzing legal clauses", 40)
             
             legal_clauses = await self.legal_analyzer.analyze_document(processed_doc)
             
             logger.info(f"Legal analysis completed for {document_id}. Found {len(legal_clauses)} clauses")
             
-            # Step 3: Risk Assessment
-            status_tracker[document_id].current_step = "Assessing risk levels"
-            status_tracker[document_id].progress = 60
-            
-            risk_assessment = await self.risk_assessor.assess_document_risk(legal_clauses)
+            # Steps 3-5: Risk Assessment, Document Summary and Comprehensive Explanation
+            # All three only need the clauses, so they run concurrently
+            self._update_status(status_tracker, document_id, "Assessing risk and generating document explanation", 60)
+            
+            if not self._needs_comprehensive_explanation(legal_clauses):
+                logger.info(f"Low-risk document {document_id}, using a template explanation")
+                summary_and_explanation = self._generate_summary_with_default_explanation(
+                    summary_task or self._generate_document_summary(processed_doc),
+                    legal_clauses
+                )
+            elif summary_task is None:
+                summary_and_explanation = self._generate_summary_and_explanation(processed_doc, legal_clauses)
+            else:
+                summary_and_explanation = asyncio.gather(
+                    summary_task,
+                    self._generate_comprehensive_explanation(processed_doc, legal_clauses)
+                )
+            
+            risk_assessment, (document_summary, explanation_data) = await self._gather_or_cancel(
+                self.risk_assessor.assess_document_risk(legal_clauses),
+                summary_and_explanation
+            )
             
             logger.info(f"Risk assessment completed for {document_id}. Overall risk: {risk_assessment.overall_risk}")
             
-            # Step 4: Generate Document Summary
-            status_tracker[document_id].current_step = "Generating document summary"
-            status_tracker[document_id].progress = 80
-            
-            document_summary = await self._generate_document_summary(processed_doc)
-            
-            # Step 5: Generate Comprehensive Explanation
-            status_tracker[document_id].current_step = "Creating comprehensive explanation"
-            status_tracker[document_id].progress = 85
-            
-            explanation_data = await self._generate_comprehensive_explanation(processed_doc, legal_clauses)
-            
             # Step 6: Compile Results
-            status_tracker[document_id].current_step = "Compiling analysis results"
-            status_tracker[document_id].progress = 90
+            self._update_status(status_tracker, document_id, "Compiling analysis results", 90)
             
             processing_time = time.time() - start_time
             
             # Step 7: Generate AI-powered recommendations
-            status_tracker[document_id].current_step = "Generating personalized recommendations"
-            status_tracker[document_id].progress = 95
+            self._update_status(status_tracker, document_id, "Generating personalized recommendations", 95)
             
-            ai_recommendations = await self._generate_ai_recommendations(
-                legal_clauses, risk_assessment, processed_doc.document_type.value
+            # Group clauses by risk band and category once for all report builders
+            clause_aggregate = await asyncio.to_thread(ClauseAggregate, legal_clauses)
+            
+            ai_recommendations, risk_categories, red_flags = await self._generate_report_insights(
+                clause_aggregate, risk_assessment, processed_doc.document_type.value
             )
             
             # Create final analysis result
@@ -92,9 +216,9 @@ class OrchestratorAgent:
                 overall_risk_score=risk_assessment.overall_risk,
                 document_summary=document_summary,
                 key_clauses=legal_clauses,
-                risk_categories=await self._create_enhanced_risk_categories(legal_clauses, processed_doc.document_type.value),
+                risk_categories=risk_categories,
                 recommendations=ai_recommendations,
-                red_flags=await self._identify_ai_red_flags(legal_clauses),
+                red_flags=red_flags,
                 document_explanation=explanation_data.get("document_explanation", ""),
                 key_provisions_explained=explanation_data.get("key_provisions", []),
                 legal_implications=explanation_data.get("legal_implications", []),
@@ -114,31 +238,97 @@ class OrchestratorAgent:
         except Exception as e:
             logger.error(f"Document processing failed for {document_id}: {str(e)}")
             raise
+        finally:
+            # Don't leave the summary request running if an earlier step failed or we were cancelled
+            if summary_task is not None and not summary_task.done():
+                summary_task.cancel()
+    
+    async def _single_flight(self, key: Tuple[str, ...], make_coro):
+        """Await the running task for key, starting it from make_coro if none is running.
+        
+        Callers are shielded from each other, so one caller being cancelled does not
+        cancel the shared task for the rest.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coro())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.info(f"Joining in-flight request for {key}")
+        
+        return await asyncio.shield(task)
+    
+    async def _gather_or_cancel(self, *aws):
+        """Run awaitables concurrently and return their results, cancelling the rest as soon as one fails"""
+        tasks = [asyncio.ensure_future(aw) for aw in aws]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def _update_status(self, status_tracker: Dict[str, ProcessingStatus], document_id: str, current_step: str, progress: int):
+        """Record the current step in the status snapshot and push it to status watchers"""
+        status = status_tracker[document_id]
+        status.current_step = current_step
+        status.progress = progress
+        status_bus.publish(document_id, status.model_dump())
     
     async def handle_user_query(self, document_id: str, query: str) -> QueryResult:
-        """Handle user queries about processed documents"""
+        """Handle user queries about processed documents; identical concurrent queries share one answer"""
+        normalized_query = " ".join(query.lower().split())
+        return await self._single_flight(
+            ("query", document_id, normalized_query),
+            lambda: self._answer_user_query(document_id, query, normalized_query)
+        )
+    
+    async def _answer_user_query(self, document_id: str, query: str, normalized_query: str) -> QueryResult:
+        """Answer a query with the query handler agent, reusing the answer to a repeated question"""
         try:
-            if document_id not in self.analysis_cache:
+            analysis = self.analysis_cache.get(document_id)
+            if not analysis:
                 raise ValueError(f"Document {document_id} not found or not processed")
             
-            analysis = self.analysis_cache[document_id]
+            # A reprocessed document has a new analysis, so answers about the old one no longer count
+            cache_key = (document_id, normalized_query)
+            cached = self.query_cache.get(cache_key)
+            if cached is not None and cached[0] is analysis:
+                logger.info(f"Using cached answer for query on document {document_id}")
+                return cached[1].model_copy(update={"query": query})
+            
             processed_doc = self.processed_documents.get(document_id)
             
             if not processed_doc:
                 raise ValueError(f"Processed document {document_id} not found")
             
             # Use query handler agent
-            return await self.query_handler.handle_query(
+            result = await self.query_handler.handle_query(
                 query=query,
                 document_id=document_id,
                 document_text=processed_doc.extracted_text,
-                legal_clauses=analysis.key_clauses
+                legal_clauses=analysis.key_clauses,
+                document_sentences=await self._get_document_sentences(document_id, processed_doc)
             )
+            self.query_cache[cache_key] = (analysis, result)
+            return result
             
         except Exception as e:
             logger.error(f"Query handling failed for {document_id}: {str(e)}")
             raise
     
+    async def _get_document_sentences(self, document_id: str, processed_doc: ProcessedDocument) -> List[Tuple[str, frozenset]]:
+        """Get a document's sentences for query context, splitting it at most once while they stay cached"""
+        # A reprocessed document is a new object, so sentences split from the old one no longer count
+        cached = self.sentence_cache.get(document_id)
+        if cached is not None and cached[0] is processed_doc:
+            return cached[1]
+        
+        sentences = await asyncio.to_thread(split_sentences, processed_doc.extracted_text)
+        self.sentence_cache[document_id] = (processed_doc, sentences)
+        return sentences
+    
     async def get_processing_status(self, document_id: str) -> ProcessingStatus:
         """Get current processing status"""
         # This would be implemented with a proper status tracking system
@@ -153,68 +343,89 @@ class OrchestratorAgent:
     async def _generate_document_summary(self, processed_doc: ProcessedDocument) -> DocumentSummary:
         """Generate a summary of the document using Gemini"""
         try:
-            summary_data = await self.gemini_service.extract_document_summary(processed_doc.extracted_text)
-            
-            return DocumentSummary(
-                parties=summary_data.get("parties", []),
-                key_dates=summary_data.get("key_dates", []),
-                key_amounts=summary_data.get("key_amounts", []),
-                duration=summary_data.get("duration"),
-                main_purpose=summary_data.get("main_purpose", ""),
-                jurisdiction=summary_data.get("jurisdiction")
-            )
+            # Reuse the summary of an identical document if one was generated before
+            text_hash = llm_cache.hash_text(processed_doc.extracted_text)
+            cache_version = self._get_cache_version(SUMMARY_PROMPT_VERSION)
+            summary_data = llm_cache.check(text_hash, cache_version)
+            if summary_data is None:
+                summary_data = await asyncio.wait_for(
+                    self.gemini_service.extract_document_summary(processed_doc.extracted_text),
+                    timeout=LLM_STEP_TIMEOUT
+                )
+                llm_cache.save(text_hash, cache_version, summary_data)
+            
+            return self._build_document_summary(summary_data)
         except Exception as e:
             logger.error(f"Failed to generate document summary: {str(e)}")
             raise
     
-    def _create_risk_categories(self, clauses: List[LegalClause]) -> List[RiskCategory]:
-        """Create risk categories based on analyzed clauses"""
-        category_data = {}
-        
-        for clause in clauses:
-            category = clause.clause_type.value if clause.clause_type else "other"
-            if category not in category_data:
-                category_data[category] = {
-                    "scores": [],
-                    "count": 0,
-                    "high_risk_count": 0
-                }
-            
-            category_data[category]["scores"].append(clause.risk_score)
-            category_data[category]["count"] += 1
-            if clause.risk_score >= 7:
-                category_data[category]["high_risk_count"] += 1
+    def _build_document_summary(self, summary_data: Dict[str, Any]) -> DocumentSummary:
+        """Create a DocumentSummary from summary data returned by Gemini"""
+        return DocumentSummary(
+            parties=summary_data.get("parties", []),
+            key_dates=summary_data.get("key_dates", []),
+            key_amounts=summary_data.get("key_amounts", []),
+            duration=summary_data.get("duration"),
+            main_purpose=summary_data.get("main_purpose", ""),
+            jurisdiction=summary_data.get("jurisdiction")
+        )
+    
+    async def _generate_summary_and_explanation(self, processed_doc: ProcessedDocument, clauses: List[LegalClause]) -> Tuple[DocumentSummary, Dict[str, Any]]:
+        """Generate the summary and explanation with a single Gemini request when neither is cached"""
+        text = processed_doc.extracted_text
+        doc_type = processed_doc.document_type.value if processed_doc.document_type else "other"
+        clause_data = self._build_explanation_clause_data(clauses)
+        
+        summary_hash = llm_cache.hash_text(text)
+        summary_version = self._get_cache_version(SUMMARY_PROMPT_VERSION)
+        explanation_hash = self._get_explanation_cache_hash(text, doc_type, clause_data)
+        explanation_version = self._get_cache_version(EXPLANATION_PROMPT_VERSION)
+        
+        if llm_cache.check(summary_hash, summary_version) is None and llm_cache.check(explanation_hash, explanation_version) is None:
+            try:
+                combined = await asyncio.wait_for(
+                    self.gemini_service.extract_summary_and_explanation(text, doc_type, clause_data),
+                    timeout=LLM_STEP_TIMEOUT
+                )
+                llm_cache.save(summary_hash, summary_version, combined["summary"])
+                llm_cache.save(explanation_hash, explanation_version, combined["explanation"])
+                
+                logger.info(f"Summary and explanation generated together for {processed_doc.document_id}")
+                return self._build_document_summary(combined["summary"]), combined["explanation"]
+            except Exception as e:
+                logger.warning(f"Combined summary and explanation request failed, using separate requests: {str(e)}")
         
+        # One half is cached (or the combined request failed), so only request what is missing
+        return await asyncio.gather(
+            self._generate_document_summary(processed_doc),
+            self._generate_comprehensive_explanation(processed_doc, clauses)
+        )
+    
+    def _get_cache_version(self, prompt_version: str) -> str:
+        """Get the LLM cache version key for a document-level prompt"""
+        return f"{self.gemini_service.model_name}:{prompt_version}"
+    
+    def _create_risk_categories(self, aggregate: ClauseAggregate) -> List[RiskCategory]:
+        """Create risk categories based on analyzed clauses"""
         risk_categories = []
-        for category, data in category_data.items():
-            avg_score = sum(data["scores"]) / len(data["scores"]) if data["scores"] else 5
+        for category, category_clauses in aggregate.clauses_by_category.items():
+            count = len(category_clauses)
+            avg_score = aggregate.category_score_sums[category] / count
             
-            description = self._get_category_description(category, data["high_risk_count"], data["count"])
+            description = self._get_category_description(category, aggregate.category_high_risk_counts[category], count)
             
             risk_categories.append(RiskCategory(
                 category=category.replace("_", " ").title(),
                 score=int(round(avg_score)),
                 description=description,
-                clauses_count=data["count"]
+                clauses_count=count
             ))
         
         return risk_categories
     
     def _get_category_description(self, category: str, high_risk_count: int, total_count: int) -> str:
         """Get description for risk category"""
-        risk_descriptions = {
-            "payment_terms": "Financial obligations and payment requirements",
-            "termination": "Conditions and procedures for ending the agreement",
-            "liability": "Responsibility and damage provisions",
-            "confidentiality": "Information protection and non-disclosure requirements",
-            "intellectual_property": "Rights and ownership of intellectual assets",
-            "dispute_resolution": "Methods for resolving conflicts and disagreements",
-            "governing_law": "Legal jurisdiction and applicable laws",
-            "amendment": "Procedures for modifying the agreement",
-            "other": "Other legal provisions and general terms"
-        }
-        
-        base_description = risk_descriptions.get(category, "Legal provisions")
+        base_description = RISK_DESCRIPTIONS.get(category, "Legal provisions")
         
         if high_risk_count > 0:
             return f"{base_description}. Contains {high_risk_count} high-risk provision(s)."
@@ -223,32 +434,83 @@ class OrchestratorAgent:
         else:
             return base_description
     
-    async def _generate_ai_recommendations(self, clauses: List[LegalClause], risk_assessment, document_type: str) -> List[str]:
+    async def _generate_report_insights(self, aggregate: ClauseAggregate, risk_assessment, document_type: str) -> Tuple[List[str], List[RiskCategory], List[str]]:
+        """Generate recommendations, risk categories and red flags, with a single Gemini request when COMBINE_REPORT_INSIGHTS is on"""
+        if COMBINE_REPORT_INSIGHTS:
+            try:
+                basic_categories = self._create_risk_categories(aggregate)
+                insights = await asyncio.wait_for(
+                    self.gemini_service.generate_report_insights(
+                        document_type,
+                        self._build_recommendation_input(aggregate, risk_assessment, document_type),
+                        [
+                            self._build_category_input(category.category, category_clauses, document_type)
+                            for category, category_clauses in zip(basic_categories, aggregate.clauses_by_category.values())
+                        ],
+                        self._build_red_flag_input(aggregate)
+                    ),
+                    timeout=LLM_STEP_TIMEOUT
+                )
+                
+                # Any part missing from the response falls back to its template version
+                recommendations = insights["recommendations"][:8] or self._generate_fallback_recommendations(aggregate, risk_assessment)
+                
+                risk_categories = []
+                for category in basic_categories:
+                    ai_description = insights["category_descriptions"].get(category.category.lower(), "")
+                    risk_categories.append(RiskCategory(
+                        category=category.category,
+                        score=category.score,
+                        description=ai_description if len(ai_description) > 10 else category.description,
+                        clauses_count=category.clauses_count
+                    ))
+                
+                red_flags = insights["red_flags"][:6] if aggregate.critical_clauses else []
+                if not red_flags:
+                    red_flags = await asyncio.to_thread(self._identify_red_flags, aggregate)
+                
+                logger.info("Recommendations, category descriptions and red flags generated together")
+                return recommendations, risk_categories, red_flags
+            except Exception as e:
+                logger.warning(f"Combined report insights request failed, using separate requests: {str(e)}")
+        
+        return await asyncio.gather(
+            self._generate_ai_recommendations(aggregate, risk_assessment, document_type),
+            self._create_enhanced_risk_categories(aggregate, document_type),
+            self._identify_ai_red_flags(aggregate)
+        )
+    
+    def _build_recommendation_input(self, aggregate: ClauseAggregate, risk_assessment, document_type: str) -> Dict[str, Any]:
+        """Summarize the clauses and overall risk for recommendation generation"""
+        high_risk_clauses = aggregate.high_risk_clauses
+        
+        clause_summary = {
+            "total_clauses": len(aggregate.clauses),
+            "high_risk_count": len(high_risk_clauses),
+            "medium_risk_count": aggregate.medium_risk_count,
+            "overall_risk": risk_assessment.overall_risk,
+            "document_type": document_type,
+            "high_risk_types": aggregate.high_risk_categories,
+            "key_concerns": []
+        }
+        
+        # Collect key concerns from high-risk clauses
+        for clause in high_risk_clauses[:5]:  # Top 5 high-risk clauses
+            concerns = clause.concerns
+            if concerns:
+                clause_summary["key_concerns"].extend(concerns[:2])  # Top 2 concerns per clause
+        
+        return clause_summary
+    
+    async def _generate_ai_recommendations(self, aggregate: ClauseAggregate, risk_assessment, document_type: str) -> List[str]:
         """Generate AI-powered contextual recommendations"""
         try:
-            # Prepare clause summary for AI analysis
-            high_risk_clauses = [c for c in clauses if c.risk_score >= 7]
-            medium_risk_clauses = [c for c in clauses if 4 <= c.risk_score < 7]
-            
-            clause_summary = {
-                "total_clauses": len(clauses),
-                "high_risk_count": len(high_risk_clauses),
-                "medium_risk_count": len(medium_risk_clauses),
-                "overall_risk": risk_assessment.overall_risk,
-                "document_type": document_type,
-                "high_risk_types": [c.clause_type.value if c.clause_type else "other" for c in high_risk_clauses],
-                "key_concerns": []
-            }
-            
-            # Collect key concerns from high-risk clauses
-            for clause in high_risk_clauses[:5]:  # Top 5 high-risk clauses
-                concerns = getattr(clause, 'concerns', [])
-                if concerns:
-                    clause_summary["key_concerns"].extend(concerns[:2])  # Top 2 concerns per clause
+            clause_summary = self._build_recommendation_input(aggregate, risk_assessment, document_type)
             
             # Generate AI recommendations
-            recommendations_data = await self.gemini_service.generate_risk_recommendations(
-                document_type, clause_summary
+            recommendations_data = await asyncio.wait_for(
+                self.gemini_service.generate_risk_recommendations(document_type, clause_summary),
+                timeout=LLM_STEP_TIMEOUT
             )
             
             if recommendations_data and isinstance(recommendations_data, dict):
@@ -257,43 +519,34 @@ class OrchestratorAgent:
                     return ai_recommendations[:8]  # Limit to 8 AI recommendations
             
             logger.warning("AI recommendation generation failed, falling back to template-based")
-            return self._generate_fallback_recommendations(clauses, risk_assessment)
+            return self._generate_fallback_recommendations(aggregate, risk_assessment)
             
         except Exception as e:
             logger.error(f"Failed to generate AI recommendations: {str(e)}")
-            return self._generate_fallback_recommendations(clauses, risk_assessment)
+            return self._generate_fallback_recommendations(aggregate, risk_assessment)
     
-    def _generate_fallback_recommendations(self, clauses: List[LegalClause], risk_assessment) -> List[str]:
+    def _generate_fallback_recommendations(self, aggregate: ClauseAggregate, risk_assessment) -> List[str]:
         """Generate fallback template-based recommendations"""
         recommendations = []
         
         # High-risk clauses recommendations
-        high_risk_clauses = [c for c in clauses if c.risk_score >= 7]
+        high_risk_clauses = aggregate.high_risk_clauses
         if high_risk_clauses:
             recommendations.append(
                 f"Review {len(high_risk_clauses)} high-risk clause(s) carefully before signing"
             )
         
         # Category-specific recommendations
-        clause_types = set(c.clause_type.value if c.clause_type else "other" for c in clauses)
-        
-        if "payment_terms" in clause_types:
-            payment_clauses = [c for c in clauses if (c.clause_type.value if c.clause_type else "other") == "payment_terms"]
-            high_risk_payment = [c for c in payment_clauses if c.risk_score >= 7]
-            if high_risk_payment:
-                recommendations.append("Carefully review payment terms for potential hidden fees or penalties")
-        
-        if "termination" in clause_types:
-            termination_clauses = [c for c in clauses if (c.clause_type.value if c.clause_type else "other") == "termination"]
-            high_risk_termination = [c for c in termination_clauses if c.risk_score >= 7]
-            if high_risk_termination:
-                recommendations.append("Pay special attention to termination conditions and penalties")
-        
-        if "liability" in clause_types:
-            liability_clauses = [c for c in clauses if (c.clause_type.value if c.clause_type else "other") == "liability"]
-            high_risk_liability = [c for c in liability_clauses if c.risk_score >= 7]
-            if high_risk_liability:
-                recommendations.append("Consider the extent of liability and potential financial exposure")
+        high_risk_types = aggregate.category_high_risk_counts
+        
+        if high_risk_types.get("payment_terms"):
+            recommendations.append("Carefully review payment terms for potential hidden fees or penalties")
+        
+        if high_risk_types.get("termination"):
+            recommendations.append("Pay special attention to termination conditions and penalties")
+        
+        if high_risk_types.get("liability"):
+            recommendations.append("Consider the extent of liability and potential financial exposure")
         
         # Overall risk recommendations
         if risk_assessment.overall_risk >= 7:
@@ -301,55 +554,76 @@ class OrchestratorAgent:
         elif risk_assessment.overall_risk >= 4:
             recommendations.append("Moderate risk - consider professional review of key terms")
         
-        # Add clause-specific recommendations
-        for clause in clauses:
-            clause_recommendations = getattr(clause, 'recommendations', [])
-            if clause_recommendations:
-                recommendations.extend(clause_recommendations[:2])  # Limit to top 2 per clause
+        # Add clause-specific recommendations, skipping duplicates and stopping once the list is full
+        seen = set(recommendations)
+        for clause in aggregate.clauses:
+            if len(recommendations) >= MAX_RECOMMENDATIONS:
+                break
+            
+            for recommendation in clause.recommendations[:2]:  # Limit to top 2 per clause
+                if recommendation not in seen and len(recommendations) < MAX_RECOMMENDATIONS:
+                    seen.add(recommendation)
+                    recommendations.append(recommendation)
         
-        # Remove duplicates and limit total
-        unique_recommendations = list(dict.fromkeys(recommendations))
-        return unique_recommendations[:10]  # Limit to 10 recommendations
+        return recommendations
     
     def _generate_recommendations(self, clauses: List[LegalClause], risk_assessment) -> List[str]:
         """Legacy method - kept for backward compatibility"""
-        return self._generate_fallback_recommendations(clauses, risk_assessment)
+        return self._generate_fallback_recommendations(ClauseAggregate(clauses), risk_assessment)
     
-    async def _create_enhanced_risk_categories(self, clauses: List[LegalClause], document_type: str) -> List[RiskCategory]:
+    async def _create_enhanced_risk_categories(self, aggregate: ClauseAggregate, document_type: str) -> List[RiskCategory]:
         """Create enhanced risk categories with AI-generated descriptions"""
+        # Get basic risk categories first, built in the same order as the aggregate's category groups
+        basic_categories = self._create_risk_categories(aggregate)
+        
         try:
-            # Get basic risk categories first
-            basic_categories = self._create_risk_categories(clauses)
+            # Enhance each category with AI-generated descriptions, requesting them all at once
+            descriptions = await asyncio.gather(
+                *(
+                    self._generate_category_description(category.category, category_clauses, document_type)
+                    for category, category_clauses in zip(basic_categories, aggregate.clauses_by_category.values())
+                ),
+                return_exceptions=True
+            )
             
-            # Enhance each category with AI-generated descriptions
             enhanced_categories = []
-            for category in basic_categories:
-                try:
-                    # Get clauses for this category
-                    category_clauses = [c for c in clauses if (c.clause_type.value if c.clause_type else "other").replace("_", " ").title() == category.category]
-                    
-                    # Generate AI description for this category
-                    ai_description = await self._generate_category_description(
-                        category.category, category_clauses, document_type
-                    )
-                    
-                    enhanced_category = RiskCategory(
-                        category=category.category,
-                        score=category.score,
-                        description=ai_description if ai_description else category.description,
-                        clauses_count=category.clauses_count
-                    )
-                    enhanced_categories.append(enhanced_category)
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to enhance category {category.category}: {e}")
+            for category, ai_description in zip(basic_categories, descriptions):
+                if isinstance(ai_description, Exception):
+                    logger.warning(f"Failed to enhance category {category.category}: {ai_description}")
                     enhanced_categories.append(category)  # Fallback to basic category
+                    continue
+                
+                enhanced_categories.append(RiskCategory(
+                    category=category.category,
+                    score=category.score,
+                    description=ai_description if ai_description else category.description,
+                    clauses_count=category.clauses_count
+                ))
             
             return enhanced_categories
             
         except Exception as e:
             logger.error(f"Failed to create enhanced risk categories: {e}")
-            return self._create_risk_categories(clauses)  # Fallback to basic categories
+            return basic_categories  # Fallback to basic categories
+    
+    def _build_category_input(self, category_name: str, category_clauses: List[LegalClause], document_type: str) -> Dict[str, Any]:
+        """Summarize one risk category's clauses for description generation"""
+        category_data = {
+            "category_name": category_name,
+            "total_count": len(category_clauses),
+            "high_risk_count": sum(1 for c in category_clauses if c.risk_score >= 7),
+            "average_risk": sum(c.risk_score for c in category_clauses) / len(category_clauses) if category_clauses else 0,
+            "document_type": document_type,
+            "sample_concerns": []
+        }
+        
+        # Get sample concerns from high-risk clauses
+        for clause in category_clauses[:3]:  # Top 3 clauses
+            concerns = clause.concerns
+            if concerns:
+                category_data["sample_concerns"].extend(concerns[:2])
+        
+        return category_data
     
     async def _generate_category_description(self, category_name: str, category_clauses: List[LegalClause], document_type: str) -> str:
         """Generate AI-powered description for a risk category"""
@@ -357,25 +631,14 @@ class OrchestratorAgent:
             if not category_clauses:
                 return self._get_category_description(category_name.lower().replace(" ", "_"), 0, 0)
             
-            # Prepare data for AI generation
-            high_risk_count = len([c for c in category_clauses if c.risk_score >= 7])
-            category_data = {
-                "category_name": category_name,
-                "total_count": len(category_clauses),
-                "high_risk_count": high_risk_count,
-                "average_risk": sum(c.risk_score for c in category_clauses) / len(category_clauses),
-                "document_type": document_type,
-                "sample_concerns": []
-            }
-            
-            # Get sample concerns from high-risk clauses
-            for clause in category_clauses[:3]:  # Top 3 clauses
-                concerns = getattr(clause, 'concerns', [])
-                if concerns:
-                    category_data["sample_concerns"].extend(concerns[:2])
+            category_data = self._build_category_input(category_name, category_clauses, document_type)
+            high_risk_count = category_data["high_risk_count"]
             
             # Generate AI description
-            description_data = await self.gemini_service.generate_category_description(category_data)
+            description_data = await asyncio.wait_for(
+                self.gemini_service.generate_category_description(category_data),
+                timeout=LLM_STEP_TIMEOUT
+            )
             
             if description_data and isinstance(description_data, dict):
                 ai_description = description_data.get("description", "")
@@ -387,37 +650,25 @@ class OrchestratorAgent:
             
         except Exception as e:
             logger.warning(f"Failed to generate AI description for {category_name}: {e}")
-            high_risk_count = len([c for c in category_clauses if c.risk_score >= 7])
+            high_risk_count = sum(1 for c in category_clauses if c.risk_score >= 7)
             return self._get_category_description(category_name.lower().replace(" ", "_"), high_risk_count, len(category_clauses))
     
-    async def _identify_ai_red_flags(self, clauses: List[LegalClause]) -> List[str]:
+    async def _identify_ai_red_flags(self, aggregate: ClauseAggregate) -> List[str]:
         """Identify red flags using AI analysis"""
         try:
             # Get critical clauses (high risk)
-            critical_clauses = [c for c in clauses if c.risk_score >= 8]
+            critical_clauses = aggregate.critical_clauses
             
             if not critical_clauses:
-                return self._identify_red_flags(clauses)  # Fallback to template-based
-            
-            # Prepare data for AI analysis
-            red_flag_data = {
-                "total_clauses": len(clauses),
-                "critical_clause_count": len(critical_clauses),
-                "critical_clauses": []
-            }
+                return await asyncio.to_thread(self._identify_red_flags, aggregate)  # Fallback to template-based
             
-            # Add critical clause details for AI analysis
-            for clause in critical_clauses[:5]:  # Top 5 critical clauses
-                clause_data = {
-                    "type": clause.clause_type.value if clause.clause_type else "other",
-                    "risk_score": clause.risk_score,
-                    "risk_explanation": clause.risk_explanation[:200],  # Truncate for token efficiency
-                    "concerns": getattr(clause, 'concerns', [])[:3]  # Top 3 concerns
-                }
-                red_flag_data["critical_clauses"].append(clause_data)
+            red_flag_data = self._build_red_flag_input(aggregate)
             
             # Generate AI red flags
-            flags_data = await self.gemini_service.generate_red_flags(red_flag_data)
+            flags_data = await asyncio.wait_for(
+                self.gemini_service.generate_red_flags(red_flag_data),
+                timeout=LLM_STEP_TIMEOUT
+            )
             
             if flags_data and isinstance(flags_data, dict):
                 ai_red_flags = flags_data.get("red_flags", [])
@@ -425,40 +676,57 @@ class OrchestratorAgent:
                     return ai_red_flags[:6]  # Limit to 6 AI red flags
             
             # Fallback to template-based red flags
-            return self._identify_red_flags(clauses)
+            return await asyncio.to_thread(self._identify_red_flags, aggregate)
             
         except Exception as e:
             logger.error(f"Failed to generate AI red flags: {e}")
-            return self._identify_red_flags(clauses)
+            return await asyncio.to_thread(self._identify_red_flags, aggregate)
+    
+    def _build_red_flag_input(self, aggregate: ClauseAggregate) -> Dict[str, Any]:
+        """Summarize the critical clauses for red flag generation"""
+        critical_clauses = aggregate.critical_clauses
+        red_flag_data = {
+            "total_clauses": len(aggregate.clauses),
+            "critical_clause_count": len(critical_clauses),
+            "critical_clauses": []
+        }
+        
+        # Add critical clause details for AI analysis
+        for clause in critical_clauses[:5]:  # Top 5 critical clauses
+            clause_data = {
+                "type": clause.clause_type.value if clause.clause_type else "other",
+                "risk_score": clause.risk_score,
+                "risk_explanation": clause.risk_explanation[:200],  # Truncate for token efficiency
+                "concerns": clause.concerns[:3]  # Top 3 concerns
+            }
+            red_flag_data["critical_clauses"].append(clause_data)
+        
+        return red_flag_data
     
-    def _identify_red_flags(self, clauses: List[LegalClause]) -> List[str]:
+    def _identify_red_flags(self, aggregate: ClauseAggregate) -> List[str]:
         """Identify critical red flags in the document (template-based fallback)"""
         red_flags = []
+        seen = set()
         
         # Very high risk clauses (9-10)
-        critical_clauses = [c for c in clauses if c.risk_score >= 9]
-        for clause in critical_clauses:
+        for clause in aggregate.very_high_risk_clauses:
             clause_type_display = (clause.clause_type.value if clause.clause_type else "other").replace('_', ' ')
-            red_flags.append(f"Critical risk in {clause_type_display}: {clause.risk_explanation[:100]}...")
+            red_flag = f"Critical risk in {clause_type_display}: {clause.risk_explanation[:100]}..."
+            if red_flag not in seen:
+                seen.add(red_flag)
+                red_flags.append(red_flag)
+                if len(red_flags) == MAX_TEMPLATE_RED_FLAGS:
+                    return red_flags  # No room left for pattern flags, so skip the text scan
         
-        # Specific red flag patterns
-        for clause in clauses:
-            text_lower = clause.original_text.lower()
-            
-            # Financial red flags
-            if any(term in text_lower for term in ['unlimited liability', 'unlimited damages', 'no cap on liability']):
-                red_flags.append("Unlimited liability exposure detected")
-            
-            # Termination red flags
-            if any(term in text_lower for term in ['terminate at will', 'terminate without cause', 'immediate termination']):
-                red_flags.append("One-sided termination rights detected")
-            
-            # Payment red flags
-            if any(term in text_lower for term in ['non-refundable', 'forfeiture', 'penalty fee']):
-                red_flags.append("Non-refundable fees or penalties detected")
+        # Specific red flag patterns (liability, termination, payment), all found in one scan per clause
+        found_patterns = set()
+        for clause in aggregate.clauses:
+            found_patterns |= RED_FLAG_MATCHER.matched_labels(clause.text_lower)
+            if len(found_patterns) == len(RED_FLAG_TERMS):
+                break
         
-        # Remove duplicates
-        return list(dict.fromkeys(red_flags))[:5]  # Limit to 5 red flags
+        red_flags.extend(message for message in RED_FLAG_TERMS if message in found_patterns)
+        return red_flags[:MAX_TEMPLATE_RED_FLAGS]
     
     def get_analysis_result(self, document_id: str) -> DocumentAnalysis:
         """Get cached analysis result"""
@@ -471,35 +739,24 @@ class OrchestratorAgent:
     async def _generate_comprehensive_explanation(self, processed_doc: ProcessedDocument, clauses: List[LegalClause]) -> Dict[str, Any]:
         """Generate comprehensive explanation of the document"""
         try:
-            # Convert clauses to simple dict format for the explanation service
-            clause_data = []
-            for i, clause in enumerate(clauses):
-                try:
-                    # Safely get clause type
-                    clause_type = getattr(clause, 'clause_type', None)
-                    clause_type_value = clause_type.value if clause_type else "other"
-                    
-                    clause_dict = {
-                        "clause_type": clause_type_value,
-                        "simplified_text": getattr(clause, 'simplified_text', ''),
-                        "risk_score": getattr(clause, 'risk_score', 5),
-                        "concerns": getattr(clause, 'concerns', []),
-                        "obligations": getattr(clause, 'obligations', [])
-                    }
-                    clause_data.append(clause_dict)
-                except Exception as clause_error:
-                    logger.error(f"Error processing clause {i}: {clause_error}")
-                    # Skip problematic clause and continue
-                    continue
+            clause_data = self._build_explanation_clause_data(clauses)
             
             # Safely get document type
             doc_type = processed_doc.document_type.value if processed_doc.document_type else "other"
             
-            explanation = await self.gemini_service.generate_comprehensive_explanation(
-                processed_doc.extracted_text,
-                doc_type,
-                clause_data
-            )
+            explanation_hash = self._get_explanation_cache_hash(processed_doc.extracted_text, doc_type, clause_data)
+            cache_version = self._get_cache_version(EXPLANATION_PROMPT_VERSION)
+            explanation = llm_cache.check(explanation_hash, cache_version)
+            if explanation is None:
+                explanation = await asyncio.wait_for(
+                    self.gemini_service.generate_comprehensive_explanation(
+                        processed_doc.extracted_text,
+                        doc_type,
+                        clause_data
+                    ),
+                    timeout=LLM_STEP_TIMEOUT
+                )
+                llm_cache.save(explanation_hash, cache_version, explanation)
             
             logger.info(f"Comprehensive explanation generated for {processed_doc.document_id}")
             return explanation
@@ -515,3 +772,74 @@ class OrchestratorAgent:
                 "clause_summaries": ["Clause analysis unavailable"],
                 "overall_risk_explanation": "Risk assessment unavailable due to processing error"
             }
+    
+    def _needs_comprehensive_explanation(self, clauses: List[LegalClause]) -> bool:
+        """Check whether the clause risk scores justify a Gemini explanation request"""
+        if EXPLANATION_MIN_CLAUSE_RISK <= 0 and EXPLANATION_MIN_AVERAGE_RISK <= 0:
+            return True
+        if not clauses:
+            return False
+        
+        scores = [clause.risk_score for clause in clauses]
+        return max(scores) >= EXPLANATION_MIN_CLAUSE_RISK or sum(scores) / len(scores) >= EXPLANATION_MIN_AVERAGE_RISK
+    
+    async def _generate_summary_with_default_explanation(self, summary, clauses: List[LegalClause]) -> Tuple[DocumentSummary, Dict[str, Any]]:
+        """Await the summary and pair it with a template explanation"""
+        return await summary, self._build_default_explanation(clauses)
+    
+    def _build_default_explanation(self, clauses: List[LegalClause]) -> Dict[str, Any]:
+        """Compose a short explanation of a low-risk document from the clauses' simplified text"""
+        clause_summaries = [
+            f"{clause.clause_type.value.replace('_', ' ').title()}: {clause.simplified_text}"
+            for clause in clauses
+            if clause.simplified_text
+        ]
+        
+        return {
+            "document_explanation": (
+                f"This document contains {len(clauses)} identified clauses, none of which were rated high risk. "
+                "The clause summaries below describe what each one means in plain language."
+            ),
+            "key_provisions": clause_summaries[:5],
+            "legal_implications": ["No clauses with significant legal risk were identified"],
+            "practical_impact": "The terms appear standard; review the clause summaries to confirm they match your expectations.",
+            "clause_summaries": clause_summaries,
+            "overall_risk_explanation": "All clauses scored below the high-risk threshold, so the document is considered low risk."
+        }
+    
+    def _build_explanation_clause_data(self, clauses: List[LegalClause]) -> List[Dict[str, Any]]:
+        """Convert clauses to the slim dict format sent to the explanation service"""
+        # LegalClause always carries these fields, so they are read directly
+        return [
+            {
+                "clause_type": clause.clause_type.value if clause.clause_type else "other",
+                "simplified_text": clause.simplified_text[:EXPLANATION_CLAUSE_TEXT_CHARS],
+                "risk_score": clause.risk_score,
+                "concerns": clause.concerns[:EXPLANATION_CLAUSE_MAX_CONCERNS]
+            }
+            for clause in clauses
+        ]
+    
+    def _get_explanation_cache_hash(self, text: str, doc_type: str, clause_data: List[Dict[str, Any]]) -> str:
+        """Hash the explanation inputs: text, document type and clause data, ignoring clause order"""
+        explanation_key = json.dumps(
+            {
+                "text": text,
+                "document_type": doc_type,
+                "clauses": sorted(clause_data, key=lambda c: (c["clause_type"], c["risk_score"]))
+            },
+            sort_keys=True,
+            default=str
+        )
+        return llm_cache.hash_text(explanation_key)
+
+
+# Global instance
+orchestrator_agent = None
+
+def get_orchestrator_agent() -> OrchestratorAgent:
+    """Get global orchestrator instance, shared so agents and document caches are built once per process"""
+    global orchestrator_agent
+    if orchestrator_agent is None:
+        orchestrator_agent = OrchestratorAgent()
+    return orchestrator_agent
@@ -1,15 +1,55 @@
 import time
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import re
+import heapq
+from collections import Counter
 
-from models.document import LegalClause, ClauseType
+from models.document import LegalClause, ClauseType, WORD_RE, split_sentences
 from models.analysis import QueryResult
 from services.modern_gemini_service import get_modern_gemini_service
 from utils.text_processor import text_processor
+from utils.keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+# Words ignored when comparing query and clause keywords
+COMMON_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'must', 'shall'})
+
+# Words ignored when finding common query topics
+QUERY_STATS_COMMON_WORDS = frozenset({'what', 'how', 'when', 'where', 'why', 'who', 'can', 'will', 'would', 'could', 'should', 'do', 'does', 'did', 'is', 'are', 'was', 'were', 'the', 'a', 'an', 'and', 'or', 'but'})
+
+# Clause types whose answers tend to be definitive
+DEFINITIVE_CLAUSE_TYPES = frozenset({ClauseType.PAYMENT_TERMS, ClauseType.TERMINATION, ClauseType.GOVERNING_LAW})
+
+# Standard questions suggested for each clause type present in a document, in suggestion order
+SUGGESTED_QUESTIONS = {
+    ClauseType.PAYMENT_TERMS: (
+        "What are the payment terms and due dates?",
+        "Are there any late fees or penalties?",
+        "What payment methods are accepted?"
+    ),
+    ClauseType.TERMINATION: (
+        "How can this agreement be terminated?",
+        "What happens if I need to end this early?",
+        "Are there any termination penalties?"
+    ),
+    ClauseType.LIABILITY: (
+        "What am I liable for under this agreement?",
+        "What are the limits on liability?",
+        "What damages could I be responsible for?"
+    ),
+    ClauseType.CONFIDENTIALITY: (
+        "What information must be kept confidential?",
+        "How long do confidentiality obligations last?"
+    ),
+    ClauseType.DISPUTE_RESOLUTION: (
+        "How are disputes resolved?",
+        "Is arbitration required for disagreements?"
+    ),
+}
+
 class QueryHandlerAgent:
     def __init__(self):
         self.gemini_service = get_modern_gemini_service()
@@ -26,9 +66,30 @@ class QueryHandlerAgent:
             r'(change|modify|amend|alter)': [ClauseType.AMENDMENT],
             r'(indemnif|hold harmless|protect)': [ClauseType.INDEMNIFICATION]
         }
+        
+        # (clause types, words in the pattern) for each question pattern
+        self._pattern_info = [
+            (clause_types, frozenset(re.findall(r'\w+', pattern)))
+            for pattern, clause_types in self.question_patterns.items()
+        ]
+        self._pattern_matcher = self._build_pattern_matcher()
+    
+    def _build_pattern_matcher(self) -> KeywordMatcher:
+        """Build one matcher over every question pattern's alternatives, labelled with the pattern indices"""
+        keyword_patterns: Dict[str, set] = {}
+        for index, pattern in enumerate(self.question_patterns):
+            alternatives = pattern.strip('()').split('|')
+            for keyword in alternatives:
+                # An alternative extending another one of the same pattern never changes whether it matches
+                if any(keyword != other and keyword.startswith(other) for other in alternatives):
+                    continue
+                keyword_patterns.setdefault(keyword, set()).add(index)
+        
+        return KeywordMatcher({keyword: frozenset(indices) for keyword, indices in keyword_patterns.items()})
     
-    async def handle_query(self, query: str, document_id: str, document_text: str, legal_clauses: List[LegalClause]) -> QueryResult:
-        """Handle a user query about the document"""
+    async def handle_query(self, query: str, document_id: str, document_text: str, legal_clauses: List[LegalClause],
+                           document_sentences: Optional[List[Tuple[str, frozenset]]] = None) -> QueryResult:
+        """Handle a user query about the document; pass the document's split sentences to skip splitting the text"""
         start_time = time.time()
         
         try:
@@ -37,8 +98,11 @@ class QueryHandlerAgent:
             # Step 1: Find relevant clauses based on query
             relevant_clauses = self._find_relevant_clauses(query, legal_clauses)
             
-            # Step 2: Extract relevant context from document
-            relevant_context = self._extract_relevant_context(query, document_text, relevant_clauses)
+            # Step 2: Extract relevant context from document; the scan grows with the document,
+            # so it runs in a worker thread to keep the event loop free for other requests
+            relevant_context = await asyncio.to_thread(
+                self._extract_relevant_context, query, document_text, relevant_clauses, document_sentences
+            )
             
             # Step 3: Generate answer using Gemini
             answer_data = await self._generate_answer(query, relevant_context, relevant_clauses)
@@ -76,6 +140,18 @@ class QueryHandlerAgent:
         """Find clauses relevant to the user's query"""
         query_lower = query.lower()
         
+        # The query is the same for every clause, so match it against all question patterns in one scan
+        matched_indices = set().union(*self._pattern_matcher.matched_labels(query_lower))
+        matched_patterns = [
+            pattern_info for index, pattern_info in enumerate(self._pattern_info)
+            if index in matched_indices
+        ]
+        
+        # Query keywords, ignoring common words. Clause keywords are tokenized once per clause and
+        # reused by later queries; common words drop out of the overlap because the query has none
+        query_keywords = frozenset(WORD_RE.findall(query_lower)) - COMMON_WORDS
+        keyword_weight = 1.0 / len(query_keywords) if query_keywords else 0.0
+        
         # Score clauses based on relevance
         clause_scores = []
         
@@ -83,55 +159,42 @@ class QueryHandlerAgent:
             score = 0.0
             
             # Score based on clause type matching query patterns
-            for pattern, clause_types in self.question_patterns.items():
-                if re.search(pattern, query_lower):
-                    if clause.clause_type in clause_types:
-                        score += 3.0
-                    elif any(keyword in clause.original_text.lower() for keyword in re.findall(r'\w+', pattern)):
-                        score += 1.0
-            
-            # Score based on keyword overlap
-            query_keywords = set(re.findall(r'\b\w+\b', query_lower))
-            clause_keywords = set(re.findall(r'\b\w+\b', clause.original_text.lower()))
+            for clause_types, pattern_words in matched_patterns:
+                if clause.clause_type in clause_types:
+                    score += 3.0
+                # A pattern word found as a whole word settles it without scanning for stems like "terminat"
+                elif not pattern_words.isdisjoint(clause.keywords) or any(keyword in clause.text_lower for keyword in pattern_words):
+                    score += 1.0
             
-            # Remove common words
-            common_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'must', 'shall'}
-            query_keywords -= common_words
-            clause_keywords -= common_words
-            
-            if query_keywords and clause_keywords:
-                overlap = len(query_keywords.intersection(clause_keywords))
-                score += overlap / len(query_keywords) * 2.0
+            # Score based on keyword overlap; isdisjoint stops at the first shared word and skips clauses with none
+            if query_keywords and not query_keywords.isdisjoint(clause.keywords):
+                score += len(query_keywords & clause.keywords) * keyword_weight * 2.0
             
             # Boost score for high-risk clauses (they're often important)
             if clause.risk_score >= 7:
                 score += 0.5
             
             # Score based on simplified text match (often clearer)
-            if clause.simplified_text:
-                simplified_keywords = set(re.findall(r'\b\w+\b', clause.simplified_text.lower())) - common_words
-                if query_keywords and simplified_keywords:
-                    overlap = len(query_keywords.intersection(simplified_keywords))
-                    score += overlap / len(query_keywords) * 1.5
+            if clause.simplified_text and query_keywords and not query_keywords.isdisjoint(clause.simplified_keywords):
+                score += len(query_keywords & clause.simplified_keywords) * keyword_weight * 1.5
             
             clause_scores.append((clause, score))
         
-        # Sort by score and return top relevant clauses
-        clause_scores.sort(key=lambda x: x[1], reverse=True)
+        # Only the top 5 are ever returned, so select them without sorting every clause
+        top_scores = heapq.nlargest(5, clause_scores, key=lambda x: x[1])
         
         # Return clauses with score > 0.5, up to 5 clauses
-        relevant_clauses = [clause for clause, score in clause_scores if score > 0.5][:5]
+        relevant_clauses = [clause for clause, score in top_scores if score > 0.5]
         
         # If no relevant clauses found, return top 2 highest scoring
-        if not relevant_clauses and clause_scores:
-            relevant_clauses = [clause_scores[0][0]]
-            if len(clause_scores) > 1:
-                relevant_clauses.append(clause_scores[1][0])
+        if not relevant_clauses:
+            relevant_clauses = [clause for clause, _ in top_scores[:2]]
         
         logger.debug(f"Found {len(relevant_clauses)} relevant clauses for query")
         return relevant_clauses
     
-    def _extract_relevant_context(self, query: str, document_text: str, relevant_clauses: List[LegalClause]) -> str:
+    def _extract_relevant_context(self, query: str, document_text: str, relevant_clauses: List[LegalClause],
+                                  document_sentences: Optional[List[Tuple[str, frozenset]]] = None) -> str:
         """Extract relevant context from the document"""
         # Use the text from relevant clauses as primary context
         context_parts = []
@@ -141,31 +204,17 @@ class QueryHandlerAgent:
             context_parts.append(f"[{clause.clause_type.value.replace('_', ' ').title()}] {clause.original_text}")
         
         # Add some surrounding context from the document if needed
-        query_keywords = set(re.findall(r'\b\w+\b', query.lower()))
-        
-        # Find additional relevant sentences from the document
-        sentences = re.split(r'[.!?]+', document_text)
-        relevant_sentences = []
-        
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if len(sentence) < 20:  # Skip very short sentences
-                continue
-                
-            sentence_keywords = set(re.findall(r'\b\w+\b', sentence.lower()))
-            
-            # Check for keyword overlap
-            if query_keywords and sentence_keywords:
-                overlap = len(query_keywords.intersection(sentence_keywords))
-                if overlap >= 2:  # At least 2 keywords match
-                    # Check if this sentence is not already in clause text
-                    is_duplicate = any(sentence.lower() in clause.original_text.lower() for clause in relevant_clauses)
-                    if not is_duplicate:
-                        relevant_sentences.append(sentence)
+        query_keywords = frozenset(WORD_RE.findall(query.lower()))
+        if query_keywords:
+            if document_sentences is None:
+                document_sentences = split_sentences(document_text)
+            relevant_sentences = self._find_relevant_sentences(query_keywords, document_sentences, relevant_clauses)
+        else:
+            relevant_sentences = []
         
         # Add top relevant sentences (limit to avoid too much context)
         if relevant_sentences:
-            context_parts.extend(relevant_sentences[:3])
+            context_parts.extend(relevant_sentences)
         
         # Combine all context
         full_context = '\n\n'.join(context_parts)
@@ -176,6 +225,27 @@ class QueryHandlerAgent:
         
         return full_context
     
+    def _find_relevant_sentences(self, query_keywords: frozenset, document_sentences: List[Tuple[str, frozenset]],
+                                 relevant_clauses: List[LegalClause], limit: int = 3) -> List[str]:
+        """Find up to `limit` document sentences sharing at least 2 keywords with the query"""
+        # Clause texts joined once so each duplicate check is a single substring search
+        clause_text = '\0'.join(clause.text_lower for clause in relevant_clauses)
+        
+        relevant_sentences = []
+        for sentence, sentence_keywords in document_sentences:
+            if len(query_keywords & sentence_keywords) < 2:  # At least 2 keywords match
+                continue
+            
+            # Check if this sentence is not already in clause text
+            if sentence.lower() in clause_text:
+                continue
+            
+            relevant_sentences.append(sentence)
+            if len(relevant_sentences) >= limit:
+                break
+        
+        return relevant_sentences
+    
     async def _generate_answer(self, query: str, context: str, relevant_clauses: List[LegalClause]) -> Dict[str, Any]:
         """Generate answer using Gemini"""
         try:
@@ -222,8 +292,7 @@ class QueryHandlerAgent:
             confidence -= 0.1
         
         # Adjust based on clause types (some are more definitive)
-        definitive_types = {ClauseType.PAYMENT_TERMS, ClauseType.TERMINATION, ClauseType.GOVERNING_LAW}
-        has_definitive = any(clause.clause_type in definitive_types for clause in relevant_clauses)
+        has_definitive = any(clause.clause_type in DEFINITIVE_CLAUSE_TYPES for clause in relevant_clauses)
         if has_definitive:
             confidence += 0.1
         
@@ -252,53 +321,22 @@ class QueryHandlerAgent:
     
     def suggest_related_questions(self, document_text: str, legal_clauses: List[LegalClause]) -> List[str]:
         """Suggest related questions based on document content"""
-        suggestions = []
-        
         # Get clause types present in document
         clause_types = set(clause.clause_type for clause in legal_clauses)
         
         # Standard questions based on clause types
-        if ClauseType.PAYMENT_TERMS in clause_types:
-            suggestions.extend([
-                "What are the payment terms and due dates?",
-                "Are there any late fees or penalties?",
-                "What payment methods are accepted?"
-            ])
-        
-        if ClauseType.TERMINATION in clause_types:
-            suggestions.extend([
-                "How can this agreement be terminated?",
-                "What happens if I need to end this early?",
-                "Are there any termination penalties?"
-            ])
-        
-        if ClauseType.LIABILITY in clause_types:
-            suggestions.extend([
-                "What am I liable for under this agreement?",
-                "What are the limits on liability?",
-                "What damages could I be responsible for?"
-            ])
-        
-        if ClauseType.CONFIDENTIALITY in clause_types:
-            suggestions.extend([
-                "What information must be kept confidential?",
-                "How long do confidentiality obligations last?"
-            ])
-        
-        if ClauseType.DISPUTE_RESOLUTION in clause_types:
-            suggestions.extend([
-                "How are disputes resolved?",
-                "Is arbitration required for disagreements?"
-            ])
+        suggestions = [
+            question
+            for clause_type, questions in SUGGESTED_QUESTIONS.items() if clause_type in clause_types
+            for question in questions
+        ]
         
         # High-risk clause questions
-        high_risk_clauses = [c for c in legal_clauses if c.risk_score >= 7]
-        if high_risk_clauses:
+        if any(c.risk_score >= 7 for c in legal_clauses):
             suggestions.append("What are the highest risk terms in this document?")
         
-        # Remove duplicates and limit
-        unique_suggestions = list(dict.fromkeys(suggestions))
-        return unique_suggestions[:8]
+        # Questions are distinct across clause types, so only the limit applies
+        return suggestions[:8]
     
     def get_query_statistics(self, queries: List[QueryResult]) -> Dict[str, Any]:
         """Get statistics about processed queries"""
@@ -314,18 +352,13 @@ class QueryHandlerAgent:
         
         # Identify common topics/keywords
         all_queries_text = ' '.join(q.query for q in queries).lower()
-        words = re.findall(r'\b\w+\b', all_queries_text)
+        words = WORD_RE.findall(all_queries_text)
         
         # Count word frequency (excluding common words)
-        common_words = {'what', 'how', 'when', 'where', 'why', 'who', 'can', 'will', 'would', 'could', 'should', 'do', 'does', 'did', 'is', 'are', 'was', 'were', 'the', 'a', 'an', 'and', 'or', 'but'}
-        filtered_words = [word for word in words if word not in common_words and len(word) > 3]
-        
-        word_counts = {}
-        for word in filtered_words:
-            word_counts[word] = word_counts.get(word, 0) + 1
+        word_counts = Counter(word for word in words if len(word) > 3 and word not in QUERY_STATS_COMMON_WORDS)
         
         # Get top topics
-        common_topics = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        common_topics = word_counts.most_common(10)
         
         return {
             "total_queries": len(queries),
@@ -1,4 +1,5 @@
 import asyncio
+import os
 import time
 from typing import List, Dict, Any
 import logging
@@ -6,9 +7,24 @@ import logging
 from models.document import LegalClause, ClauseType
 from models.analysis import RiskAssessmentResult
 from services.modern_gemini_service import get_modern_gemini_service
+from utils.llm_cache import llm_cache
 
 logger = logging.getLogger(__name__)
 
+# Enhanced clause assessments in flight at once for one document
+RISK_ENHANCEMENT_CONCURRENCY = int(os.getenv("RISK_ENHANCEMENT_CONCURRENCY", 8))
+
+# Bump when the risk enhancement prompt changes so stale cache entries are ignored
+RISK_ENHANCEMENT_PROMPT_VERSION = "risk_enhancement_v1"
+
+# (minimum overall risk, level description, overall recommendation), highest threshold first
+RISK_LEVELS = (
+    (8, "Critical Risk", "CRITICAL: This document poses significant risks. Professional legal review is strongly recommended before signing."),
+    (6, "High Risk", "HIGH RISK: Consider having a lawyer review this document, especially the high-risk clauses."),
+    (4, "Moderate Risk", "MODERATE RISK: Review highlighted clauses carefully and consider seeking advice on unclear terms."),
+    (0, "Low Risk", "LOW RISK: Document appears to have reasonable terms, but still review carefully.")
+)
+
 class RiskAssessorAgent:
     def __init__(self):
         self.gemini_service = get_modern_gemini_service()
@@ -93,7 +109,8 @@ class RiskAssessorAgent:
     
     async def _enhance_clause_risk_assessments(self, clauses: List[LegalClause]) -> List[LegalClause]:
         """Enhance risk assessments for clauses that need more detailed analysis"""
-        enhanced_clauses = []
+        # Only clauses the enhancement changes are copied; the rest are passed through as they are
+        enhanced_clauses = list(clauses)
         
         # Process high-priority clauses for enhanced assessment
         high_priority_types = {
@@ -103,36 +120,63 @@ class RiskAssessorAgent:
             ClauseType.TERMINATION
         }
         
-        for clause in clauses:
-            enhanced_clause = clause.copy()
+        eligible = [
+            (index, clause) for index, clause in enumerate(clauses)
+            if clause.clause_type in high_priority_types and clause.risk_score >= 6
+        ]
+        if not eligible:
+            return enhanced_clauses
+        
+        # The assessments are independent, so run them concurrently with a bounded number in flight;
+        # repeated boilerplate clauses share one assessment
+        semaphore = asyncio.Semaphore(RISK_ENHANCEMENT_CONCURRENCY)
+        clause_texts = list(dict.fromkeys(clause.original_text for _, clause in eligible))
+        results = await asyncio.gather(
+            *(self._assess_clause_risk(clause_text, semaphore) for clause_text in clause_texts),
+            return_exceptions=True
+        )
+        assessments = dict(zip(clause_texts, results))
+        
+        for index, clause in eligible:
+            enhanced_assessment = assessments[clause.original_text]
+            if isinstance(enhanced_assessment, Exception):
+                logger.warning(f"Enhanced risk assessment failed for clause {clause.clause_id}: {str(enhanced_assessment)}")
+                continue
             
-            # Enhanced assessment for high-priority clause types
-            if clause.clause_type in high_priority_types and clause.risk_score >= 6:
-                try:
-                    enhanced_assessment = await self.gemini_service.assess_risk(clause.original_text)
-                    
-                    # Update risk score if enhancement provides better assessment
-                    enhanced_risk = enhanced_assessment.get("risk_score", clause.risk_score)
-                    if abs(enhanced_risk - clause.risk_score) <= 2:  # Reasonable range
-                        enhanced_clause.risk_score = enhanced_risk
-                        
-                        # Update risk explanation with enhanced analysis
-                        enhanced_explanation = enhanced_assessment.get("risk_explanation", "")
-                        if enhanced_explanation:
-                            enhanced_clause.risk_explanation = enhanced_explanation
-                        
-                        # Add any additional recommendations
-                        enhanced_recommendations = enhanced_assessment.get("recommendations", [])
-                        if enhanced_recommendations:
-                            enhanced_clause.recommendations.extend(enhanced_recommendations[:2])
-                    
-                except Exception as e:
-                    logger.warning(f"Enhanced risk assessment failed for clause {clause.clause_id}: {str(e)}")
-            
-            enhanced_clauses.append(enhanced_clause)
+            # Update risk score if enhancement provides better assessment
+            enhanced_risk = enhanced_assessment.get("risk_score", clause.risk_score)
+            if abs(enhanced_risk - clause.risk_score) <= 2:  # Reasonable range
+                updates = {"risk_score": enhanced_risk}
+                
+                # Update risk explanation with enhanced analysis
+                enhanced_explanation = enhanced_assessment.get("risk_explanation", "")
+                if enhanced_explanation:
+                    updates["risk_explanation"] = enhanced_explanation
+                
+                # Add any additional recommendations
+                enhanced_recommendations = enhanced_assessment.get("recommendations", [])
+                if enhanced_recommendations:
+                    updates["recommendations"] = clause.recommendations + enhanced_recommendations[:2]
+                
+                enhanced_clauses[index] = clause.model_copy(update=updates)
         
         return enhanced_clauses
     
+    async def _assess_clause_risk(self, clause_text: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Get an enhanced risk assessment for a clause, reusing the cached result for text seen before"""
+        text_hash = llm_cache.hash_text(clause_text)
+        cache_version = f"{self.gemini_service.model_name}:{RISK_ENHANCEMENT_PROMPT_VERSION}"
+        
+        cached_assessment = llm_cache.check(text_hash, cache_version)
+        if cached_assessment is not None:
+            return cached_assessment
+        
+        async with semaphore:
+            assessment = await self.gemini_service.assess_risk(clause_text)
+        
+        llm_cache.save(text_hash, cache_version, assessment)
+        return assessment
+    
     def _calculate_overall_risk(self, clauses: List[LegalClause]) -> float:
         """Calculate weighted overall risk score for the document"""
         if not clauses:
@@ -166,9 +210,22 @@ class RiskAssessorAgent:
     def _calculate_document_risk_adjustments(self, clauses: List[LegalClause]) -> float:
         """Calculate risk adjustments based on document-level factors"""
         adjustment = 0.0
+        critical_types = {ClauseType.LIABILITY, ClauseType.INDEMNIFICATION}
+        protective_types = {ClauseType.SEVERABILITY, ClauseType.FORCE_MAJEURE}
+        
+        # Gather every document-level factor in one pass over the clauses
+        high_risk_count = 0
+        critical_scores = []
+        has_protective = False
+        for clause in clauses:
+            if clause.risk_score >= 7:
+                high_risk_count += 1
+            if clause.clause_type in critical_types:
+                critical_scores.append(clause.risk_score)
+            elif clause.clause_type in protective_types:
+                has_protective = True
         
         # High number of high-risk clauses
-        high_risk_count = len([c for c in clauses if c.risk_score >= 7])
         high_risk_ratio = high_risk_count / len(clauses)
         
         if high_risk_ratio > 0.3:  # More than 30% high-risk clauses
@@ -177,19 +234,13 @@ class RiskAssessorAgent:
             adjustment += 0.2
         
         # Critical clause types present
-        critical_types = {ClauseType.LIABILITY, ClauseType.INDEMNIFICATION}
-        critical_clauses = [c for c in clauses if c.clause_type in critical_types]
-        
-        for clause in critical_clauses:
-            if clause.risk_score >= 8:
+        for risk_score in critical_scores:
+            if risk_score >= 8:
                 adjustment += 0.3  # Very high-risk critical clause
-            elif clause.risk_score >= 6:
+            elif risk_score >= 6:
                 adjustment += 0.1  # Medium-risk critical clause
         
         # Lack of protective clauses
-        protective_types = {ClauseType.SEVERABILITY, ClauseType.FORCE_MAJEURE}
-        has_protective = any(c.clause_type in protective_types for c in clauses)
-        
         if not has_protective and len(clauses) > 5:
             adjustment += 0.2  # Missing protective clauses in substantial document
         
@@ -216,57 +267,53 @@ class RiskAssessorAgent:
     def _analyze_risk_distribution(self, clauses: List[LegalClause]) -> Dict[str, int]:
         """Analyze the distribution of risk scores"""
         distribution = {}
+        high_risk_count = medium_risk_count = low_risk_count = 0
         
         for clause in clauses:
             score = clause.risk_score
             distribution[str(score)] = distribution.get(str(score), 0) + 1
+            
+            if score >= 7:
+                high_risk_count += 1
+            elif score >= 4:
+                medium_risk_count += 1
+            else:
+                low_risk_count += 1
         
         # Add summary categories
         distribution["total_clauses"] = len(clauses)
-        distribution["high_risk_count"] = len([c for c in clauses if c.risk_score >= 7])
-        distribution["medium_risk_count"] = len([c for c in clauses if 4 <= c.risk_score <= 6])
-        distribution["low_risk_count"] = len([c for c in clauses if c.risk_score <= 3])
+        distribution["high_risk_count"] = high_risk_count
+        distribution["medium_risk_count"] = medium_risk_count
+        distribution["low_risk_count"] = low_risk_count
         
         return distribution
     
     def _generate_risk_recommendations(self, clauses: List[LegalClause], overall_risk: float) -> List[str]:
         """Generate recommendations based on risk assessment"""
-        recommendations = []
-        
         # Overall risk level recommendations
-        if overall_risk >= 8:
-            recommendations.append("CRITICAL: This document poses significant risks. Professional legal review is strongly recommended before signing.")
-        elif overall_risk >= 6:
-            recommendations.append("HIGH RISK: Consider having a lawyer review this document, especially the high-risk clauses.")
-        elif overall_risk >= 4:
-            recommendations.append("MODERATE RISK: Review highlighted clauses carefully and consider seeking advice on unclear terms.")
-        else:
-            recommendations.append("LOW RISK: Document appears to have reasonable terms, but still review carefully.")
+        recommendations = [self._get_risk_level(overall_risk)[2]]
+        
+        # Clause types present, and those with at least one high-risk clause, in one pass
+        clause_types = set()
+        high_risk_types = set()
+        for clause in clauses:
+            clause_types.add(clause.clause_type)
+            if clause.risk_score >= 7:
+                high_risk_types.add(clause.clause_type)
         
         # Clause-specific recommendations
-        high_risk_clauses = [c for c in clauses if c.risk_score >= 7]
+        if ClauseType.LIABILITY in high_risk_types:
+            recommendations.append("Review liability clauses carefully - they may expose you to significant financial risk.")
         
-        if high_risk_clauses:
-            liability_clauses = [c for c in high_risk_clauses if c.clause_type == ClauseType.LIABILITY]
-            if liability_clauses:
-                recommendations.append("Review liability clauses carefully - they may expose you to significant financial risk.")
-            
-            payment_clauses = [c for c in high_risk_clauses if c.clause_type == ClauseType.PAYMENT_TERMS]
-            if payment_clauses:
-                recommendations.append("Pay attention to payment terms - there may be hidden fees or penalties.")
-            
-            termination_clauses = [c for c in high_risk_clauses if c.clause_type == ClauseType.TERMINATION]
-            if termination_clauses:
-                recommendations.append("Termination clauses may be unfavorable - understand exit conditions and penalties.")
+        if ClauseType.PAYMENT_TERMS in high_risk_types:
+            recommendations.append("Pay attention to payment terms - there may be hidden fees or penalties.")
         
-        # Document type specific recommendations
-        clause_types = set(c.clause_type for c in clauses)
+        if ClauseType.TERMINATION in high_risk_types:
+            recommendations.append("Termination clauses may be unfavorable - understand exit conditions and penalties.")
         
-        if ClauseType.INDEMNIFICATION in clause_types:
-            indemnification_clauses = [c for c in clauses if c.clause_type == ClauseType.INDEMNIFICATION]
-            high_risk_indemnification = [c for c in indemnification_clauses if c.risk_score >= 7]
-            if high_risk_indemnification:
-                recommendations.append("Indemnification clauses may require you to cover legal costs - understand your potential exposure.")
+        # Document type specific recommendations
+        if ClauseType.INDEMNIFICATION in high_risk_types:
+            recommendations.append("Indemnification clauses may require you to cover legal costs - understand your potential exposure.")
         
         # Missing important clauses
         important_types = {ClauseType.TERMINATION, ClauseType.DISPUTE_RESOLUTION}
@@ -334,11 +381,11 @@ class RiskAssessorAgent:
     
     def _get_risk_level_description(self, risk_score: float) -> str:
         """Get textual description of risk level"""
-        if risk_score >= 8:
-            return "Critical Risk"
-        elif risk_score >= 6:
-            return "High Risk"
-        elif risk_score >= 4:
-            return "Moderate Risk"
-        else:
-            return "Low Risk"
\ No newline at end of file
+        return self._get_risk_level(risk_score)[1]
+    
+    def _get_risk_level(self, risk_score: float) -> tuple:
+        """Get the RISK_LEVELS entry for a risk score"""
+        for risk_level in RISK_LEVELS:
+            if risk_score >= risk_level[0]:
+                return risk_level
+        return RISK_LEVELS[-1]
\ No newline at end of file
@@ -1,14 +1,16 @@
 from crewai import Agent
+from typing import Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from crew.tools.legal_tools import LegalToolsFactory
 
 class ComplianceExpertAgent:
     """Regulatory Compliance Expert Agent"""
     
-    def __init__(self, gemini_service, llm: ChatGoogleGenerativeAI):
+    def __init__(self, gemini_service, llm: ChatGoogleGenerativeAI, tools_factory: Optional[LegalToolsFactory] = None):
         self.gemini_service = gemini_service
         self.llm = llm
-        self.tools_factory = LegalToolsFactory(gemini_service)
+        # A team passes its shared factory so the agents reuse the same tool instances
+        self.tools_factory = tools_factory or LegalToolsFactory(gemini_service)
         self.agent = self._create_agent()
     
     def _create_agent(self) -> Agent:
@@ -1,16 +1,17 @@
 from crewai import Agent
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.language_models import BaseLanguageModel
-from typing import List, Any
+from typing import List, Any, Optional
 from crew.tools.legal_tools import LegalToolsFactory
 
 class LegalResearcherAgent:
     """Legal Research Specialist Agent"""
     
-    def __init__(self, gemini_service, llm: BaseLanguageModel):
+    def __init__(self, gemini_service, llm: BaseLanguageModel, tools_factory: Optional[LegalToolsFactory] = None):
         self.gemini_service = gemini_service
         self.llm = llm
-        self.tools_factory = LegalToolsFactory(gemini_service)
+        # A team passes its shared factory so the agents reuse the same tool instances
+        self.tools_factory = tools_factory or LegalToolsFactory(gemini_service)
         self.agent = self._create_agent()
     
     def _create_agent(self) -> Agent:
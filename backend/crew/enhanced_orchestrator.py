@@ -21,6 +21,7 @@ from crew.agents.compliance_expert import ComplianceExpertAgent
 from crew.agents.negotiation_advisor import NegotiationAdvisorAgent
 from crew.agents.solutions_finder import SolutionsFinderAgent
 from crew.tasks.legal_tasks import LegalTaskFactory
+from crew.tools.legal_tools import LegalToolsFactory
 
 logger = logging.getLogger(__name__)
 
@@ -78,12 +79,14 @@ class CrewAILegalTeam:
     def _create_agents(self) -> Dict[str, Any]:
         """Create all CrewAI agents"""
         try:
+            # One tools factory for the whole team, so agents needing the same tool share one instance
+            tools_factory = LegalToolsFactory(self.gemini_service)
             agents = {
-                'researcher': LegalResearcherAgent(self.gemini_service, self.llm).get_agent(),
-                'advocate': ConsumerAdvocateAgent(self.gemini_service, self.llm).get_agent(),
-                'compliance': ComplianceExpertAgent(self.gemini_service, self.llm).get_agent(),
-                'negotiator': NegotiationAdvisorAgent(self.gemini_service, self.llm).get_agent(),
-                'solutions': SolutionsFinderAgent(self.gemini_service, self.llm).get_agent()
+                'researcher': LegalResearcherAgent(self.gemini_service, self.llm, tools_factory).get_agent(),
+                'advocate': ConsumerAdvocateAgent(self.gemini_service, self.llm, tools_factory).get_agent(),
+                'compliance': ComplianceExpertAgent(self.gemini_service, self.llm, tools_factory).get_agent(),
+                'negotiator': NegotiationAdvisorAgent(self.gemini_service, self.llm, tools_factory).get_agent(),
+                'solutions': SolutionsFinderAgent(self.gemini_service, self.llm, tools_factory).get_agent()
             }
             
             logger.info(f"Created {len(agents)} CrewAI agents: {list(agents.keys())}")
@@ -168,22 +168,31 @@ class LegalToolsFactory:
     
     def __init__(self, gemini_service):
         self.gemini_service = gemini_service
+        # Tools only wrap the shared Gemini service, so each kind is built once and shared by every agent
+        self._tools: Dict[type, BaseTool] = {}
+    
+    def _get_tool(self, tool_class: type) -> BaseTool:
+        """Get the factory's instance of a tool class, creating it on first use"""
+        tool = self._tools.get(tool_class)
+        if tool is None:
+            tool = self._tools[tool_class] = tool_class(self.gemini_service)
+        return tool
     
     def create_legal_research_tool(self) -> LegalResearchTool:
         """Create legal research tool"""
-        return LegalResearchTool(self.gemini_service)
+        return self._get_tool(LegalResearchTool)
     
     def create_compliance_tool(self) -> ComplianceCheckTool:
         """Create compliance check tool"""
-        return ComplianceCheckTool(self.gemini_service)
+        return self._get_tool(ComplianceCheckTool)
     
     def create_market_research_tool(self) -> MarketResearchTool:
         """Create market research tool"""
-        return MarketResearchTool(self.gemini_service)
+        return self._get_tool(MarketResearchTool)
     
     def create_negotiation_tool(self) -> NegotiationStrategyTool:
         """Create negotiation strategy tool"""
-        return NegotiationStrategyTool(self.gemini_service)
+        return self._get_tool(NegotiationStrategyTool)
     
     def create_all_tools(self) -> Dict[str, BaseTool]:
         """Create all legal tools"""
@@ -17,19 +17,22 @@ load_env_file()
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+import json
 import uuid
 import logging
 from typing import Optional, Dict, Any
 from datetime import datetime
 
-from agents.orchestrator import OrchestratorAgent
+from agents.orchestrator import get_orchestrator_agent
+from agents.document_processor import shutdown_extraction_pool
 from models.document import UploadedDocument, ProcessingStatus
 from models.analysis import DocumentAnalysis, QueryResult
 
 # CrewAI Integration
 from crew.enhanced_orchestrator import EnhancedOrchestrator
+from utils.status_bus import status_bus
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -49,7 +52,7 @@ app.add_middleware(
 )
 
 # Initialize orchestrator with CrewAI enhancement
-base_orchestrator = OrchestratorAgent()
+base_orchestrator = get_orchestrator_agent()
 enable_crewai = os.getenv("ENABLE_CREWAI", "true").lower() == "true"
 orchestrator = EnhancedOrchestrator(base_orchestrator, enable_crewai=enable_crewai)
 
@@ -64,6 +67,11 @@ class EnhancedUploadRequest(BaseModel):
     use_crew_enhancement: bool = True
     enable_detailed_analysis: bool = True
 
+@app.on_event("shutdown")
+async def shutdown_workers():
+    """Stop the text extraction worker processes"""
+    shutdown_extraction_pool()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -138,6 +146,26 @@ async def get_processing_status(document_id: str):
     status = processing_status[document_id]
     return status.dict()
 
+@app.get("/status/{document_id}/stream")
+async def stream_processing_status(document_id: str):
+    """Stream processing status updates for a document as server-sent events"""
+    if document_id not in processing_status:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    async def event_stream():
+        async for event in status_bus.watch(document_id, lambda: processing_status[document_id].model_dump()):
+            yield f"data: {json.dumps(event, default=str)}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def publish_status(document_id: str):
+    """Push the current status snapshot of a document to status stream watchers"""
+    status_bus.publish(document_id, processing_status[document_id].model_dump())
+
+def json_model_response(model: BaseModel) -> Response:
+    """Build a JSON response from a pydantic model in one serialization pass"""
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
 @app.get("/analysis/{document_id}")
 async def get_analysis_results(document_id: str):
     """Get analysis results for a processed document"""
@@ -157,7 +185,8 @@ async def get_analysis_results(document_id: str):
                 detail=f"Processing failed: {status.error_message}"
             )
     
-    return analysis_results[document_id].dict()
+    # Serialize with pydantic directly; returning a dict would send every clause through jsonable_encoder
+    return json_model_response(analysis_results[document_id])
 
 @app.post("/query")
 async def query_document(query_request: QueryRequest):
@@ -173,7 +202,7 @@ async def query_document(query_request: QueryRequest):
     
     try:
         result = await orchestrator.handle_user_query(document_id, query)
-        return result.dict()
+        return json_model_response(result)
     except Exception as e:
         logger.error(f"Query error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
@@ -184,6 +213,7 @@ async def process_document_async(document_id: str, file_path: str):
         processing_status[document_id].status = "processing"
         processing_status[document_id].progress = 10
         processing_status[document_id].current_step = "Starting document analysis"
+        publish_status(document_id)
         
         logger.info(f"Starting processing for document: {document_id}")
         
@@ -194,6 +224,7 @@ async def process_document_async(document_id: str, file_path: str):
         processing_status[document_id].progress = 100
         processing_status[document_id].current_step = "Analysis completed"
         processing_status[document_id].end_time = datetime.utcnow()
+        publish_status(document_id)
         
 
         logger.info(f"Processing completed for document: {document_id}")
@@ -204,6 +235,7 @@ async def process_document_async(document_id: str, file_path: str):
         processing_status[document_id].status = "failed"
         processing_status[document_id].error_message = str(e)
         processing_status[document_id].end_time = datetime.utcnow()
+        publish_status(document_id)
 
 @app.post("/upload/enhanced")
 async def upload_document_enhanced(
@@ -328,6 +360,7 @@ async def process_document_enhanced_async(document_id: str, file_path: str, use_
         processing_status[document_id].status = "processing"
         processing_status[document_id].progress = 10
         processing_status[document_id].current_step = "Starting enhanced document analysis"
+        publish_status(document_id)
         
         logger.info(f"Starting enhanced processing for document: {document_id} (CrewAI: {use_crew_enhancement})")
         
@@ -341,6 +374,7 @@ async def process_document_enhanced_async(document_id: str, file_path: str, use_
         processing_status[document_id].progress = 100
         processing_status[document_id].current_step = "Enhanced analysis completed"
         processing_status[document_id].end_time = datetime.utcnow()
+        publish_status(document_id)
         
         logger.info(f"Enhanced processing completed for document: {document_id}")
         
@@ -352,6 +386,7 @@ async def process_document_enhanced_async(document_id: str, file_path: str, use_
         processing_status[document_id].status = "failed"
         processing_status[document_id].error_message = user_message
         processing_status[document_id].end_time = datetime.utcnow()
+        publish_status(document_id)
 
 @app.get("/")
 async def root():
@@ -371,6 +406,7 @@ async def root():
             "upload": "/upload (basic analysis)",
             "enhanced_upload": "/upload/enhanced (with CrewAI)",
             "status": "/status/{document_id}",
+            "status_stream": "/status/{document_id}/stream",
             "analysis": "/analysis/{document_id}",
             "enhanced_analysis": "/analysis/{document_id}/enhanced",
             "query": "/query",
@@ -1,7 +1,25 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from enum import Enum
+from functools import cached_property
+import re
+
+# Word tokens used for keyword matching between queries and clauses
+WORD_RE = re.compile(r'\b\w+\b')
+
+# Sentence boundaries and the shortest sentence worth using as query context
+SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+MIN_SENTENCE_LENGTH = 20
+
+def split_sentences(text: str) -> List[Tuple[str, frozenset]]:
+    """Split text into sentences long enough for query context, each with its distinct lowercased words"""
+    sentences = []
+    for sentence in SENTENCE_SPLIT_RE.split(text):
+        sentence = sentence.strip()
+        if len(sentence) >= MIN_SENTENCE_LENGTH:
+            sentences.append((sentence, frozenset(WORD_RE.findall(sentence.lower()))))
+    return sentences
 
 class DocumentType(str, Enum):
     RENTAL_AGREEMENT = "rental_agreement"
@@ -66,6 +84,21 @@ class LegalClause(BaseModel):
     recommendations: List[str] = Field(default_factory=list, description="Specific recommendations for this clause")
     concerns: List[str] = Field(default_factory=list, description="Potential concerns or red flags")
     obligations: List[str] = Field(default_factory=list, description="Key obligations for each party")
+    
+    @cached_property
+    def text_lower(self) -> str:
+        """Lowercased original text, computed once per clause for keyword scans"""
+        return self.original_text.lower()
+    
+    @cached_property
+    def keywords(self) -> frozenset:
+        """Distinct lowercased words of the original text, tokenized once per clause for query matching"""
+        return frozenset(WORD_RE.findall(self.text_lower))
+    
+    @cached_property
+    def simplified_keywords(self) -> frozenset:
+        """Distinct lowercased words of the simplified text"""
+        return frozenset(WORD_RE.findall(self.simplified_text.lower()))
 
 class DocumentSummary(BaseModel):
     parties: List[str] = Field(default_factory=list, description="Parties involved in the document")
@@ -21,6 +21,7 @@ except ImportError:
 from models.document import ClauseType, DocumentType
 from pydantic import BaseModel, Field
 from services.openai_service import get_openai_service
+from utils.rate_limiter import is_rate_limit_error, llm_bulkhead
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,9 @@ class LegalAnalysisResponse(BaseModel):
     key_terms: List[str] = Field(default_factory=list, description="Key terms extracted")
     recommendations: List[str] = Field(default_factory=list, description="Recommendations")
 
+class LegalAnalysisBatchResponse(BaseModel):
+    analyses: List[LegalAnalysisResponse] = Field(default_factory=list, description="One analysis per clause, in input order")
+
 class DocumentClassificationResponse(BaseModel):
     document_type: str = Field(..., description="Type of document")
     confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score")
@@ -59,6 +63,19 @@ class DocumentExplanationResponse(BaseModel):
     practical_impact: str = Field(..., description="Practical impact explanation")
     clause_summaries: List[str] = Field(default_factory=list, description="Clause-by-clause summaries")
 
+class DocumentSummaryAndExplanationResponse(BaseModel):
+    summary: DocumentSummaryResponse = Field(..., description="Key facts extracted from the document")
+    explanation: DocumentExplanationResponse = Field(..., description="Comprehensive explanation of the document")
+
+class CategoryDescriptionResponse(BaseModel):
+    category: str = Field(..., description="Risk category name")
+    description: str = Field(..., description="Description of the risk category")
+
+class ReportInsightsResponse(BaseModel):
+    recommendations: List[str] = Field(default_factory=list, description="Actionable recommendations")
+    category_descriptions: List[CategoryDescriptionResponse] = Field(default_factory=list, description="One description per risk category")
+    red_flags: List[str] = Field(default_factory=list, description="Critical red flags")
+
 class ModernGeminiService:
     """Modern Gemini service using the official Google GenAI SDK"""
     
@@ -76,7 +93,8 @@ class ModernGeminiService:
         else:
             # Fallback to legacy SDK if modern one not available
             genai_legacy.configure(api_key=self.api_key)
-            self.model = genai_legacy.GenerativeModel('gemini-1.5-flash')
+            self.model_name = "gemini-1.5-flash"
+            self.model = genai_legacy.GenerativeModel(self.model_name)
             self.use_modern_sdk = False
             logger.warning("Using legacy google-generativeai SDK - consider upgrading")
         
@@ -92,13 +110,13 @@ class ModernGeminiService:
         wait=wait_exponential(multiplier=1, min=1, max=2),  # Very short waits
         retry=retry_if_exception_type((Exception,))
     )
-    async def _make_modern_request(self, prompt: str, response_schema=None) -> str:
+    async def _make_modern_request(self, prompt: str, response_schema=None, max_output_tokens: int = 2048) -> str:
         """Make request using modern Google GenAI SDK"""
         try:
             config = {
                 "response_mime_type": "application/json",
                 "temperature": 0.1,
-                "max_output_tokens": 2048,
+                "max_output_tokens": max_output_tokens,
             }
             
             if response_schema:
@@ -115,7 +133,11 @@ class ModernGeminiService:
             if hasattr(response, 'text') and response.text:
                 return response.text.strip()
             elif hasattr(response, 'parsed') and response.parsed:
-                return json.dumps(response.parsed) if not isinstance(response.parsed, str) else response.parsed
+                if isinstance(response.parsed, str):
+                    return response.parsed
+                if isinstance(response.parsed, BaseModel):
+                    return response.parsed.model_dump_json()
+                return json.dumps(response.parsed)
             else:
                 logger.warning("Empty response from Gemini API")
                 return "{}"
@@ -165,30 +187,14 @@ class ModernGeminiService:
     
     def _is_rate_limit_error(self, error: Exception) -> bool:
         """Check if error is due to rate limiting"""
-        error_str = str(error).lower()
-        
-        # Check for rate limit indicators in the error message
-        rate_limit_indicators = [
-            'rate limit', 'quota exceeded', '429', 'resource_exhausted',
-            'too many requests', 'rate_limit_exceeded'
-        ]
-        
-        # Check the error message directly
-        if any(term in error_str for term in rate_limit_indicators):
-            return True
-        
-        # Check if it's a tenacity RetryError wrapping a rate limit error
-        if hasattr(error, 'last_attempt') and error.last_attempt:
-            if hasattr(error.last_attempt, 'exception'):
-                wrapped_error = error.last_attempt.exception()
-                if wrapped_error:
-                    wrapped_error_str = str(wrapped_error).lower()
-                    if any(term in wrapped_error_str for term in rate_limit_indicators):
-                        return True
-        
-        return False
+        return is_rate_limit_error(error)
     
     async def _try_with_fallback(self, operation_name: str, gemini_func, openai_func, *args, **kwargs):
+        """Run an operation with at most llm_bulkhead.max_concurrency service calls in flight process-wide"""
+        async with llm_bulkhead:
+            return await self._call_with_fallback(operation_name, gemini_func, openai_func, *args, **kwargs)
+    
+    async def _call_with_fallback(self, operation_name: str, gemini_func, openai_func, *args, **kwargs):
         """Always use OpenAI fallback when available - skip Gemini entirely due to rate limits"""
         has_fallback = bool(self.openai_fallback)
         has_openai_func = bool(openai_func)
@@ -255,10 +261,64 @@ IMPORTANT: Respond ONLY with valid JSON using this exact structure:
         
         return await self._try_with_fallback("analyze_legal_text", _gemini_analyze, self.openai_fallback.analyze_legal_text, clause_text)
     
+    async def analyze_legal_text_batch(self, clause_texts: List[str]) -> List[Dict[str, Any]]:
+        """Analyze several legal clauses in a single request with OpenAI fallback"""
+        if not clause_texts:
+            return []
+        if len(clause_texts) == 1:
+            return [await self.analyze_legal_text(clause_texts[0])]
+        
+        async def _gemini_analyze_batch():
+            clauses_block = "\n\n".join(
+                f"CLAUSE {i + 1}:\n{clause_text}" for i, clause_text in enumerate(clause_texts)
+            )
+            
+            prompt = f"""
+Analyze each of the following {len(clause_texts)} legal clauses and provide a detailed assessment for every one:
+
+{clauses_block}
+
+INSTRUCTIONS (apply to EACH clause independently):
+1. Classify clause type from: payment_terms, termination, liability, privacy, indemnification, dispute_resolution, intellectual_property, confidentiality, force_majeure, governing_law, amendment, severability, other
+2. List key obligations for each party
+3. Assess risk level (1-10 scale) with detailed explanation
+4. Provide plain language explanation
+5. Identify potential concerns or red flags
+6. Extract key terms and definitions
+7. Provide specific recommendations
+
+IMPORTANT: Respond ONLY with valid JSON containing exactly {len(clause_texts)} analyses in the same order as the clauses above:
+{{
+    "analyses": [
+        {{
+            "clause_type": "string",
+            "obligations": ["string"],
+            "risk_score": integer,
+            "risk_explanation": "string",
+            "simplified_text": "string",
+            "concerns": ["string"],
+            "key_terms": ["string"],
+            "recommendations": ["string"]
+        }}
+    ]
+}}
+"""
+            
+            if self.use_modern_sdk:
+                max_output_tokens = min(8192, 1024 * len(clause_texts) + 1024)
+                response_text = await self._make_modern_request(prompt, LegalAnalysisBatchResponse, max_output_tokens)
+            else:
+                response_text = await self._make_legacy_request(prompt)
+            
+            result = await self._safe_json_parse(response_text)
+            return self._validate_legal_analysis_batch(result, len(clause_texts))
+        
+        return await self._try_with_fallback("analyze_legal_text_batch", _gemini_analyze_batch, self.openai_fallback.analyze_legal_text_batch, clause_texts)
+    
     async def classify_document(self, document_text: str) -> DocumentType:
         """Classify the type of legal document with OpenAI fallback"""
         async def _gemini_classify():
-            excerpt = document_text[:2000]  # Limit for better performance
+            excerpt = document_text[:4000]  # Limit for better performance
             
             prompt = f"""
 Classify this legal document into one of these types:
@@ -337,14 +397,7 @@ IMPORTANT: Respond ONLY with valid JSON:
                 response_text = await self._make_legacy_request(prompt)
             
             result = await self._safe_json_parse(response_text)
-            return {
-                "parties": result.get("parties", []) if isinstance(result.get("parties"), list) else [],
-                "key_dates": result.get("key_dates", []) if isinstance(result.get("key_dates"), list) else [],
-                "key_amounts": result.get("key_amounts", []) if isinstance(result.get("key_amounts"), list) else [],
-                "duration": result.get("duration"),
-                "main_purpose": str(result.get("main_purpose", "Unable to determine")),
-                "jurisdiction": result.get("jurisdiction")
-            }
+            return self._validate_summary_response(result)
         
         return await self._try_with_fallback("extract_document_summary", _gemini_extract, self.openai_fallback.extract_document_summary, document_text)
     
@@ -403,6 +456,15 @@ IMPORTANT: Respond ONLY with valid JSON:
             "recommendations": result.get("recommendations", []) if isinstance(result.get("recommendations"), list) else []
         }
     
+    def _validate_legal_analysis_batch(self, result: Any, expected_count: int) -> List[Dict[str, Any]]:
+        """Validate and clean a batched legal analysis response"""
+        analyses = result.get("analyses", []) if isinstance(result, dict) else result
+        if not isinstance(analyses, list) or len(analyses) != expected_count:
+            received = len(analyses) if isinstance(analyses, list) else 0
+            raise ValueError(f"Expected {expected_count} clause analyses, received {received}")
+        
+        return [self._validate_legal_analysis(item if isinstance(item, dict) else {}) for item in analyses]
+    
     def _validate_query_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and clean query response"""
         return {
@@ -474,6 +536,152 @@ IMPORTANT: Respond ONLY with valid JSON using this exact structure:
         
         return await self._try_with_fallback("generate_comprehensive_explanation", _gemini_explain, self.openai_fallback.generate_comprehensive_explanation, document_text, document_type, clauses)
     
+    async def extract_summary_and_explanation(self, document_text: str, document_type: str, clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Extract the document summary and generate the comprehensive explanation in one request with OpenAI fallback"""
+        async def _gemini_summary_and_explain():
+            content = document_text[:4000]
+            
+            clause_summary = "\n".join([
+                f"- {clause.get('clause_type', 'Unknown')}: {clause.get('simplified_text', 'No description')[:100]}..."
+                for clause in clauses[:10]
+            ])
+            
+            # Calculate risk statistics for context
+            high_risk_clauses = [c for c in clauses if c.get('risk_score', 5) >= 7]
+            medium_risk_clauses = [c for c in clauses if 4 <= c.get('risk_score', 5) <= 6]
+            low_risk_clauses = [c for c in clauses if c.get('risk_score', 5) <= 3]
+            
+            overall_risk = sum(c.get('risk_score', 5) for c in clauses) / len(clauses) if clauses else 5
+            
+            prompt = f"""
+As a legal expert, analyze this {document_type} document. Extract its key facts AND provide a comprehensive explanation that replaces generic template text with specific, detailed insights.
+
+DOCUMENT TYPE: {document_type}
+RISK CONTEXT: {len(high_risk_clauses)} high-risk, {len(medium_risk_clauses)} medium-risk, {len(low_risk_clauses)} low-risk clauses found
+OVERALL RISK SCORE: {overall_risk:.1f}/10
+
+DOCUMENT CONTENT:
+{content}
+
+KEY CLAUSES IDENTIFIED:
+{clause_summary}
+
+PART 1 - SUMMARY. EXTRACT:
+1. All parties involved (person/company names)
+2. Important dates mentioned (deadlines, effective dates, etc.)
+3. Financial amounts and monetary terms
+4. Contract duration or term length
+5. Main purpose/subject of the document
+6. Legal jurisdiction or governing law location
+
+PART 2 - EXPLANATION. PROVIDE SPECIFIC ANALYSIS (NO GENERIC TEXT):
+1. Document Overview: What exactly is this document and what does it accomplish?
+2. Key Provisions: Explain the most important terms and what they specifically require
+3. Legal Implications: What legal consequences and obligations does this create?
+4. Practical Impact: How will this document affect the parties in real-world scenarios?
+5. Risk Assessment: Detailed explanation of why the risk level is {overall_risk:.1f}/10 and what specific concerns exist
+6. Clause Analysis: Explain each major clause in simple terms
+
+CRITICAL: Replace phrases like "This document contains moderate risk factors that warrant attention" with SPECIFIC explanations of actual risks found. Be detailed and contextual.
+
+IMPORTANT: Respond ONLY with valid JSON using this exact structure:
+{{
+    "summary": {{
+        "parties": ["string"],
+        "key_dates": ["string"],
+        "key_amounts": ["string"],
+        "duration": "string or null",
+        "main_purpose": "string",
+        "jurisdiction": "string or null"
+    }},
+    "explanation": {{
+        "document_explanation": "specific explanation of what this document does and why it matters",
+        "key_provisions": ["detailed explanation of provision 1", "detailed explanation of provision 2"],
+        "legal_implications": ["specific legal consequence 1", "specific legal consequence 2"],
+        "practical_impact": "exactly how this document will affect the parties in practice",
+        "clause_summaries": ["specific explanation of clause 1", "specific explanation of clause 2"],
+        "overall_risk_explanation": "detailed explanation of the {overall_risk:.1f}/10 risk score with specific examples of concerns found"
+    }}
+}}
+"""
+            
+            if self.use_modern_sdk:
+                response_text = await self._make_modern_request(prompt, DocumentSummaryAndExplanationResponse, max_output_tokens=3072)
+            else:
+                response_text = await self._make_legacy_request(prompt)
+            
+            result = await self._safe_json_parse(response_text)
+            return self._validate_summary_and_explanation_response(result)
+        
+        return await self._try_with_fallback("extract_summary_and_explanation", _gemini_summary_and_explain, self.openai_fallback.extract_summary_and_explanation, document_text, document_type, clauses)
+    
+    async def generate_report_insights(self, document_type: str, clause_summary: Dict[str, Any], categories: List[Dict[str, Any]], red_flag_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate recommendations, category descriptions and red flags in one request with OpenAI fallback"""
+        async def _gemini_insights():
+            concerns_text = ", ".join(clause_summary.get("key_concerns", [])[:10])
+            high_risk_types = ", ".join(clause_summary.get("high_risk_types", []))
+            
+            category_details = "\n".join([
+                f"- {category.get('category_name', '')}: {category.get('total_count', 0)} clauses, "
+                f"{category.get('high_risk_count', 0)} high-risk, average risk {category.get('average_risk', 5):.1f}/10. "
+                f"Sample concerns: {', '.join(category.get('sample_concerns', [])[:5])}"
+                for category in categories
+            ])
+            
+            clause_details = ""
+            for clause in red_flag_data.get("critical_clauses", [])[:3]:  # Top 3 critical clauses
+                clause_details += f"- {clause.get('type', 'Unknown')} (Risk: {clause.get('risk_score', 0)}/10): {clause.get('risk_explanation', '')[:150]}...\n"
+            
+            prompt = f"""
+Generate the recommendations, risk category descriptions and red flags for this legal document analysis.
+
+DOCUMENT TYPE: {document_type}
+OVERALL RISK SCORE: {clause_summary.get("overall_risk", 5)}/10
+TOTAL CLAUSES: {clause_summary.get("total_clauses", 0)}
+HIGH-RISK CLAUSES: {clause_summary.get("high_risk_count", 0)}
+MEDIUM-RISK CLAUSES: {clause_summary.get("medium_risk_count", 0)}
+
+HIGH-RISK CLAUSE TYPES: {high_risk_types}
+KEY CONCERNS: {concerns_text}
+
+RISK CATEGORIES:
+{category_details}
+
+CRITICAL CLAUSES FOUND: {red_flag_data.get("critical_clause_count", 0)} out of {red_flag_data.get("total_clauses", 0)}
+
+MOST CRITICAL CLAUSE DETAILS:
+{clause_details}
+
+PART 1 - RECOMMENDATIONS. Generate 6-8 specific, actionable recommendations. Each recommendation should:
+1. Be practical and actionable
+2. Address specific risks found in the document
+3. Use clear, non-legal language
+4. Be personalized to this document type and risk profile
+
+PART 2 - CATEGORY DESCRIPTIONS. For each risk category listed above, write a concise description (2-3 sentences max) explaining what the category means in practical terms, why it matters for this document type, its risk level and any concerns identified. Use language that non-lawyers can understand.
+
+PART 3 - RED FLAGS. Based on the critical clauses above, identify 4-6 specific red flags that require immediate attention, using clear, urgent language. If no critical clauses were found, return an empty list.
+
+IMPORTANT: Respond ONLY with valid JSON using this exact structure:
+{{
+    "recommendations": ["recommendation 1", "recommendation 2", "..."],
+    "category_descriptions": [
+        {{"category": "category name exactly as listed above", "description": "clear description of this risk category"}}
+    ],
+    "red_flags": ["red flag 1", "red flag 2", "..."]
+}}
+"""
+            
+            if self.use_modern_sdk:
+                response_text = await self._make_modern_request(prompt, ReportInsightsResponse, max_output_tokens=3072)
+            else:
+                response_text = await self._make_legacy_request(prompt)
+            
+            result = await self._safe_json_parse(response_text)
+            return self._validate_report_insights_response(result)
+        
+        return await self._try_with_fallback("generate_report_insights", _gemini_insights, self.openai_fallback.generate_report_insights, document_type, clause_summary, categories, red_flag_data)
+    
     async def generate_risk_recommendations(self, document_type: str, clause_summary: Dict[str, Any]) -> Dict[str, Any]:
         """Generate AI-powered risk recommendations"""
         
@@ -628,6 +836,46 @@ IMPORTANT: Respond ONLY with valid JSON:
         result = await self._safe_json_parse(response_text)
         return self._validate_red_flags_response(result)
     
+    def _validate_summary_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and clean document summary response"""
+        return {
+            "parties": result.get("parties", []) if isinstance(result.get("parties"), list) else [],
+            "key_dates": result.get("key_dates", []) if isinstance(result.get("key_dates"), list) else [],
+            "key_amounts": result.get("key_amounts", []) if isinstance(result.get("key_amounts"), list) else [],
+            "duration": result.get("duration"),
+            "main_purpose": str(result.get("main_purpose", "Unable to determine")),
+            "jurisdiction": result.get("jurisdiction")
+        }
+    
+    def _validate_summary_and_explanation_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and clean a combined summary and explanation response"""
+        summary = result.get("summary")
+        explanation = result.get("explanation")
+        if not isinstance(summary, dict) or not isinstance(explanation, dict):
+            raise ValueError("Combined response is missing the summary or explanation object")
+        
+        return {
+            "summary": self._validate_summary_response(summary),
+            "explanation": self._validate_explanation_response(explanation)
+        }
+    
+    def _validate_report_insights_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and clean a combined recommendations, category descriptions and red flags response"""
+        if not any(isinstance(result.get(key), list) for key in ("recommendations", "category_descriptions", "red_flags")):
+            raise ValueError("Combined response is missing the recommendations, category descriptions and red flags")
+        
+        category_descriptions = result.get("category_descriptions") if isinstance(result.get("category_descriptions"), list) else []
+        return {
+            "recommendations": self._validate_recommendations_response(result)["recommendations"],
+            # Keyed by lowercased category name so callers can match them to their categories
+            "category_descriptions": {
+                str(item.get("category", "")).strip().lower(): str(item.get("description", "")).strip()
+                for item in category_descriptions
+                if isinstance(item, dict)
+            },
+            "red_flags": self._validate_red_flags_response(result)["red_flags"]
+        }
+    
     def _validate_explanation_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and clean explanation response"""
         return {
@@ -39,7 +39,7 @@ class OpenAIService:
         wait=wait_exponential(multiplier=1, min=1, max=2),  # Very short waits
         retry=retry_if_exception_type((Exception,))
     )
-    async def _make_request(self, prompt: str, temperature: float = 0.1) -> str:
+    async def _make_request(self, prompt: str, temperature: float = 0.1, max_tokens: int = 2048) -> str:
         """Make request to OpenAI API"""
         try:
             response = await self.client.chat.completions.create(
@@ -49,7 +49,7 @@ class OpenAIService:
                     {"role": "user", "content": prompt}
                 ],
                 temperature=temperature,
-                max_tokens=2048
+                max_tokens=max_tokens
             )
             
             if response.choices and response.choices[0].message.content:
@@ -117,9 +117,60 @@ IMPORTANT: Respond ONLY with valid JSON using this exact structure:
         result = await self._safe_json_parse(response_text)
         return self._validate_legal_analysis(result)
     
+    async def analyze_legal_text_batch(self, clause_texts: List[str]) -> List[Dict[str, Any]]:
+        """Analyze several legal clauses in a single OpenAI request"""
+        if not clause_texts:
+            return []
+        
+        clauses_block = "\n\n".join(
+            f"CLAUSE {i + 1}:\n{clause_text}" for i, clause_text in enumerate(clause_texts)
+        )
+        
+        prompt = f"""
+Analyze each of the following {len(clause_texts)} legal clauses and provide a detailed assessment for every one:
+
+{clauses_block}
+
+INSTRUCTIONS (apply to EACH clause independently):
+1. Classify clause type from: payment_terms, termination, liability, privacy, indemnification, dispute_resolution, intellectual_property, confidentiality, force_majeure, governing_law, amendment, severability, other
+2. List key obligations for each party
+3. Assess risk level (1-10 scale) with detailed explanation
+4. Provide plain language explanation
+5. Identify potential concerns or red flags
+6. Extract key terms and definitions
+7. Provide specific recommendations
+
+IMPORTANT: Respond ONLY with valid JSON containing exactly {len(clause_texts)} analyses in the same order as the clauses above:
+{{
+    "analyses": [
+        {{
+            "clause_type": "string",
+            "obligations": ["string"],
+            "risk_score": integer,
+            "risk_explanation": "string",
+            "simplified_text": "string",
+            "concerns": ["string"],
+            "key_terms": ["string"],
+            "recommendations": ["string"]
+        }}
+    ]
+}}
+"""
+        
+        max_tokens = min(8192, 1024 * len(clause_texts) + 1024)
+        response_text = await self._make_request(prompt, max_tokens=max_tokens)
+        result = await self._safe_json_parse(response_text)
+        
+        analyses = result.get("analyses", []) if isinstance(result, dict) else result
+        if not isinstance(analyses, list) or len(analyses) != len(clause_texts):
+            received = len(analyses) if isinstance(analyses, list) else 0
+            raise ValueError(f"Expected {len(clause_texts)} clause analyses, received {received}")
+        
+        return [self._validate_legal_analysis(item if isinstance(item, dict) else {}) for item in analyses]
+    
     async def classify_document(self, document_text: str) -> DocumentType:
         """Classify the type of legal document"""
-        excerpt = document_text[:2000]
+        excerpt = document_text[:4000]
         
         prompt = f"""
 Classify this legal document into one of these types:
@@ -187,14 +238,7 @@ IMPORTANT: Respond ONLY with valid JSON:
         
         response_text = await self._make_request(prompt)
         result = await self._safe_json_parse(response_text)
-        return {
-            "parties": result.get("parties", []) if isinstance(result.get("parties"), list) else [],
-            "key_dates": result.get("key_dates", []) if isinstance(result.get("key_dates"), list) else [],
-            "key_amounts": result.get("key_amounts", []) if isinstance(result.get("key_amounts"), list) else [],
-            "duration": result.get("duration"),
-            "main_purpose": str(result.get("main_purpose", "Unable to determine")),
-            "jurisdiction": result.get("jurisdiction")
-        }
+        return self._validate_summary_response(result)
     
     async def answer_query(self, document_context: str, relevant_clauses: List[str], query: str) -> Dict[str, Any]:
         """Answer user query about document"""
@@ -285,6 +329,138 @@ IMPORTANT: Respond ONLY with valid JSON using this exact structure:
         result = await self._safe_json_parse(response_text)
         return self._validate_explanation_response(result)
     
+    async def extract_summary_and_explanation(self, document_text: str, document_type: str, clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Extract the document summary and generate the comprehensive explanation in one request"""
+        content = document_text[:4000]
+        
+        clause_summary = "\n".join([
+            f"- {clause.get('clause_type', 'Unknown')}: {clause.get('simplified_text', 'No description')[:100]}..."
+            for clause in clauses[:10]
+        ])
+        
+        # Calculate risk statistics for context
+        high_risk_clauses = [c for c in clauses if c.get('risk_score', 5) >= 7]
+        medium_risk_clauses = [c for c in clauses if 4 <= c.get('risk_score', 5) <= 6]
+        low_risk_clauses = [c for c in clauses if c.get('risk_score', 5) <= 3]
+        
+        overall_risk = sum(c.get('risk_score', 5) for c in clauses) / len(clauses) if clauses else 5
+        
+        prompt = f"""
+As a legal expert, analyze this {document_type} document. Extract its key facts AND provide a comprehensive explanation that replaces generic template text with specific, detailed insights.
+
+DOCUMENT TYPE: {document_type}
+RISK CONTEXT: {len(high_risk_clauses)} high-risk, {len(medium_risk_clauses)} medium-risk, {len(low_risk_clauses)} low-risk clauses found
+OVERALL RISK SCORE: {overall_risk:.1f}/10
+
+DOCUMENT CONTENT:
+{content}
+
+KEY CLAUSES IDENTIFIED:
+{clause_summary}
+
+PART 1 - SUMMARY. EXTRACT:
+1. All parties involved (person/company names)
+2. Important dates mentioned (deadlines, effective dates, etc.)
+3. Financial amounts and monetary terms
+4. Contract duration or term length
+5. Main purpose/subject of the document
+6. Legal jurisdiction or governing law location
+
+PART 2 - EXPLANATION. PROVIDE SPECIFIC ANALYSIS (NO GENERIC TEXT):
+1. Document Overview: What exactly is this document and what does it accomplish?
+2. Key Provisions: Explain the most important terms and what they specifically require
+3. Legal Implications: What legal consequences and obligations does this create?
+4. Practical Impact: How will this document affect the parties in real-world scenarios?
+5. Risk Assessment: Detailed explanation of why the risk level is {overall_risk:.1f}/10 and what specific concerns exist
+6. Clause Analysis: Explain each major clause in simple terms
+
+CRITICAL: Replace phrases like "This document contains moderate risk factors that warrant attention" with SPECIFIC explanations of actual risks found. Be detailed and contextual.
+
+IMPORTANT: Respond ONLY with valid JSON using this exact structure:
+{{
+    "summary": {{
+        "parties": ["string"],
+        "key_dates": ["string"],
+        "key_amounts": ["string"],
+        "duration": "string or null",
+        "main_purpose": "string",
+        "jurisdiction": "string or null"
+    }},
+    "explanation": {{
+        "document_explanation": "specific explanation of what this document does and why it matters",
+        "key_provisions": ["detailed explanation of provision 1", "detailed explanation of provision 2"],
+        "legal_implications": ["specific legal consequence 1", "specific legal consequence 2"],
+        "practical_impact": "exactly how this document will affect the parties in practice",
+        "clause_summaries": ["specific explanation of clause 1", "specific explanation of clause 2"],
+        "overall_risk_explanation": "detailed explanation of the {overall_risk:.1f}/10 risk score with specific examples of concerns found"
+    }}
+}}
+"""
+        
+        response_text = await self._make_request(prompt, max_tokens=3072)
+        result = await self._safe_json_parse(response_text)
+        return self._validate_summary_and_explanation_response(result)
+    
+    async def generate_report_insights(self, document_type: str, clause_summary: Dict[str, Any], categories: List[Dict[str, Any]], red_flag_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate recommendations, category descriptions and red flags in one request"""
+        concerns_text = ", ".join(clause_summary.get("key_concerns", [])[:10])
+        high_risk_types = ", ".join(clause_summary.get("high_risk_types", []))
+        
+        category_details = "\n".join([
+            f"- {category.get('category_name', '')}: {category.get('total_count', 0)} clauses, "
+            f"{category.get('high_risk_count', 0)} high-risk, average risk {category.get('average_risk', 5):.1f}/10. "
+            f"Sample concerns: {', '.join(category.get('sample_concerns', [])[:5])}"
+            for category in categories
+        ])
+        
+        clause_details = ""
+        for clause in red_flag_data.get("critical_clauses", [])[:3]:  # Top 3 critical clauses
+            clause_details += f"- {clause.get('type', 'Unknown')} (Risk: {clause.get('risk_score', 0)}/10): {clause.get('risk_explanation', '')[:150]}...\n"
+        
+        prompt = f"""
+Generate the recommendations, risk category descriptions and red flags for this legal document analysis.
+
+DOCUMENT TYPE: {document_type}
+OVERALL RISK SCORE: {clause_summary.get("overall_risk", 5)}/10
+TOTAL CLAUSES: {clause_summary.get("total_clauses", 0)}
+HIGH-RISK CLAUSES: {clause_summary.get("high_risk_count", 0)}
+MEDIUM-RISK CLAUSES: {clause_summary.get("medium_risk_count", 0)}
+
+HIGH-RISK CLAUSE TYPES: {high_risk_types}
+KEY CONCERNS: {concerns_text}
+
+RISK CATEGORIES:
+{category_details}
+
+CRITICAL CLAUSES FOUND: {red_flag_data.get("critical_clause_count", 0)} out of {red_flag_data.get("total_clauses", 0)}
+
+MOST CRITICAL CLAUSE DETAILS:
+{clause_details}
+
+PART 1 - RECOMMENDATIONS. Generate 6-8 specific, actionable recommendations. Each recommendation should:
+1. Be practical and actionable
+2. Address specific risks found in the document
+3. Use clear, non-legal language
+4. Be personalized to this document type and risk profile
+
+PART 2 - CATEGORY DESCRIPTIONS. For each risk category listed above, write a concise description (2-3 sentences max) explaining what the category means in practical terms, why it matters for this document type, its risk level and any concerns identified. Use language that non-lawyers can understand.
+
+PART 3 - RED FLAGS. Based on the critical clauses above, identify 4-6 specific red flags that require immediate attention, using clear, urgent language. If no critical clauses were found, return an empty list.
+
+IMPORTANT: Respond ONLY with valid JSON using this exact structure:
+{{
+    "recommendations": ["recommendation 1", "recommendation 2", "..."],
+    "category_descriptions": [
+        {{"category": "category name exactly as listed above", "description": "clear description of this risk category"}}
+    ],
+    "red_flags": ["red flag 1", "red flag 2", "..."]
+}}
+"""
+        
+        response_text = await self._make_request(prompt, max_tokens=3072)
+        result = await self._safe_json_parse(response_text)
+        return self._validate_report_insights_response(result)
+    
     async def generate_risk_recommendations(self, document_type: str, clause_summary: Dict[str, Any]) -> Dict[str, Any]:
         """Generate AI-powered risk recommendations using OpenAI"""
         concerns_text = ", ".join(clause_summary.get("key_concerns", [])[:10])
@@ -409,6 +585,46 @@ IMPORTANT: Respond ONLY with valid JSON:
             "sources_used": result.get("sources_used", []) if isinstance(result.get("sources_used"), list) else []
         }
     
+    def _validate_summary_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and clean document summary response"""
+        return {
+            "parties": result.get("parties", []) if isinstance(result.get("parties"), list) else [],
+            "key_dates": result.get("key_dates", []) if isinstance(result.get("key_dates"), list) else [],
+            "key_amounts": result.get("key_amounts", []) if isinstance(result.get("key_amounts"), list) else [],
+            "duration": result.get("duration"),
+            "main_purpose": str(result.get("main_purpose", "Unable to determine")),
+            "jurisdiction": result.get("jurisdiction")
+        }
+    
+    def _validate_summary_and_explanation_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and clean a combined summary and explanation response"""
+        summary = result.get("summary")
+        explanation = result.get("explanation")
+        if not isinstance(summary, dict) or not isinstance(explanation, dict):
+            raise ValueError("Combined response is missing the summary or explanation object")
+        
+        return {
+            "summary": self._validate_summary_response(summary),
+            "explanation": self._validate_explanation_response(explanation)
+        }
+    
+    def _validate_report_insights_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and clean a combined recommendations, category descriptions and red flags response"""
+        if not any(isinstance(result.get(key), list) for key in ("recommendations", "category_descriptions", "red_flags")):
+            raise ValueError("Combined response is missing the recommendations, category descriptions and red flags")
+        
+        category_descriptions = result.get("category_descriptions") if isinstance(result.get("category_descriptions"), list) else []
+        return {
+            "recommendations": self._validate_recommendations_response(result)["recommendations"],
+            # Keyed by lowercased category name so callers can match them to their categories
+            "category_descriptions": {
+                str(item.get("category", "")).strip().lower(): str(item.get("description", "")).strip()
+                for item in category_descriptions
+                if isinstance(item, dict)
+            },
+            "red_flags": self._validate_red_flags_response(result)["red_flags"]
+        }
+    
     def _validate_explanation_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and clean explanation response"""
         return {
@@ -0,0 +1,95 @@
+from array import array
+from typing import List, Dict
+
+from models.document import LegalClause, ClauseType
+
+# Stable small-integer code for each clause type
+CLAUSE_TYPES = tuple(ClauseType)
+CLAUSE_TYPE_CODES = {clause_type: code for code, clause_type in enumerate(CLAUSE_TYPES)}
+
+class ClauseTable:
+    """Column-oriented (structure of arrays) view of a clause list for aggregate statistics"""
+
+    def __init__(self, clauses: List[LegalClause]):
+        self.clause_ids = [clause.clause_id for clause in clauses]
+        # Packed int8 columns: risk scores are 1-10 and there are fewer than 128 clause types
+        self.risk_scores = array('b', (clause.risk_score for clause in clauses))
+        self.type_codes = array('b', (CLAUSE_TYPE_CODES[clause.clause_type] for clause in clauses))
+
+    def __len__(self) -> int:
+        return len(self.clause_ids)
+
+    def risk_histogram(self) -> List[int]:
+        """Count clauses per risk score, indexed 0-10"""
+        raw_scores = self.risk_scores.tobytes()
+        return [raw_scores.count(bytes((score,))) for score in range(11)]
+
+    def risk_distribution(self) -> Dict[str, int]:
+        """Count clauses per risk band"""
+        histogram = self.risk_histogram()
+        return {
+            "low_risk": sum(histogram[1:4]),
+            "medium_risk": sum(histogram[4:7]),
+            "high_risk": sum(histogram[7:11])
+        }
+
+    def average_risk(self) -> float:
+        """Mean risk score, or 0.0 for an empty table"""
+        return sum(self.risk_scores) / len(self.risk_scores) if self.risk_scores else 0.0
+
+    def highest_risk_index(self) -> int:
+        """Index of the first clause with the highest risk score"""
+        return self.risk_scores.index(max(self.risk_scores))
+
+    def type_counts(self) -> Dict[str, int]:
+        """Count clauses per clause type value, ordered by first appearance"""
+        raw_codes = self.type_codes.tobytes()
+        first_seen = {}
+        for code in range(len(CLAUSE_TYPES)):
+            position = raw_codes.find(bytes((code,)))
+            if position != -1:
+                first_seen[code] = position
+
+        return {
+            CLAUSE_TYPES[code].value: raw_codes.count(bytes((code,)))
+            for code in sorted(first_seen, key=first_seen.get)
+        }
+
+class ClauseAggregate:
+    """Clause groupings by risk band and category, computed in one pass and shared by the report builders"""
+
+    def __init__(self, clauses: List[LegalClause]):
+        self.clauses = clauses
+        self.high_risk_clauses: List[LegalClause] = []       # risk >= 7
+        self.critical_clauses: List[LegalClause] = []        # risk >= 8
+        self.very_high_risk_clauses: List[LegalClause] = []  # risk >= 9
+        self.high_risk_categories: List[str] = []            # category of each high-risk clause
+        self.medium_risk_count = 0                           # 4 <= risk < 7
+
+        # Keyed by clause type value, in order of first appearance
+        self.clauses_by_category: Dict[str, List[LegalClause]] = {}
+        self.category_score_sums: Dict[str, int] = {}
+        self.category_high_risk_counts: Dict[str, int] = {}
+
+        for clause in clauses:
+            category = clause.clause_type.value if clause.clause_type else "other"
+            risk_score = clause.risk_score
+
+            category_clauses = self.clauses_by_category.get(category)
+            if category_clauses is None:
+                category_clauses = self.clauses_by_category[category] = []
+                self.category_score_sums[category] = 0
+                self.category_high_risk_counts[category] = 0
+            category_clauses.append(clause)
+            self.category_score_sums[category] += risk_score
+
+            if risk_score >= 7:
+                self.high_risk_clauses.append(clause)
+                self.high_risk_categories.append(category)
+                self.category_high_risk_counts[category] += 1
+                if risk_score >= 8:
+                    self.critical_clauses.append(clause)
+                    if risk_score >= 9:
+                        self.very_high_risk_clauses.append(clause)
+            elif risk_score >= 4:
+                self.medium_risk_count += 1
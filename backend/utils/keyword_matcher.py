@@ -0,0 +1,70 @@
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, Set, Tuple
+import logging
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+class KeywordMatcher:
+    """Find many keywords in text in one pass, with an Aho-Corasick automaton if pyahocorasick is installed, else one regex"""
+
+    def __init__(self, keyword_labels: Dict[str, Any]):
+        # Keywords are matched case-sensitively; callers pass lowercased text with lowercase keywords
+        self.keyword_labels = dict(keyword_labels)
+        self._automaton = None
+
+        if AHOCORASICK_AVAILABLE and self.keyword_labels:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, label in self.keyword_labels.items():
+                self._automaton.add_word(keyword, (keyword, label))
+            self._automaton.make_automaton()
+
+        # Without pyahocorasick, one regex scan finds every keyword occurrence, overlapping ones included,
+        # as long as no keyword is a prefix of another (both would then start at the same position)
+        self._pattern = None
+        if self._automaton is None and self.keyword_labels and not self._has_prefix_keywords():
+            alternation = "|".join(re.escape(keyword) for keyword in self.keyword_labels)
+            self._pattern = re.compile(f"(?=({alternation}))")
+
+    def _has_prefix_keywords(self) -> bool:
+        """Check whether any keyword is a prefix of another"""
+        return any(
+            keyword != other and other.startswith(keyword)
+            for keyword in self.keyword_labels
+            for other in self.keyword_labels
+        )
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[str, Any]]:
+        """Yield (keyword, label) for every keyword occurrence in text"""
+        if self._automaton is not None:
+            for _, match in self._automaton.iter(text):
+                yield match
+            return
+
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text):
+                keyword = match.group(1)
+                yield keyword, self.keyword_labels[keyword]
+            return
+
+        for keyword, label in self.keyword_labels.items():
+            for _ in range(text.count(keyword)):
+                yield keyword, label
+
+    def count_labels(self, text: str) -> Counter:
+        """Count keyword occurrences per label"""
+        return Counter(label for _, label in self.iter_matches(text))
+
+    def matched_labels(self, text: str) -> Set[Any]:
+        """Get the set of labels with at least one keyword in text"""
+        if self._automaton is not None or self._pattern is not None:
+            return {label for _, label in self.iter_matches(text)}
+
+        return {label for keyword, label in self.keyword_labels.items() if keyword in text}
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """Persistent cache for LLM responses keyed by (model_id, prompt_version, sha256(text))"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        self.db_path = db_path or os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+        self.ttl_seconds = ttl_seconds or int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))  # 7 days
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Lazily open the SQLite database and create the cache table"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "content_hash TEXT NOT NULL, "
+                "version TEXT NOT NULL, "
+                "response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "PRIMARY KEY (content_hash, version))"
+            )
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Get SHA-256 hex digest of text"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def check(self, content_hash: str, version: str) -> Optional[Any]:
+        """Return the cached response for a hash/version pair, or None on miss"""
+        if not self.enabled:
+            return None
+
+        try:
+            with self._lock:
+                row = self._get_connection().execute(
+                    "SELECT response, created_at FROM llm_cache WHERE content_hash = ? AND version = ?",
+                    (content_hash, version)
+                ).fetchone()
+
+            if row is None:
+                return None
+
+            response, created_at = row
+            if time.time() - created_at > self.ttl_seconds:
+                return None
+
+            return json.loads(response)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {str(e)}")
+            return None
+
+    def save(self, content_hash: str, version: str, response: Any) -> None:
+        """Store a JSON-serializable response for a hash/version pair"""
+        if not self.enabled:
+            return
+
+        try:
+            with self._lock:
+                connection = self._get_connection()
+                connection.execute(
+                    "INSERT OR REPLACE INTO llm_cache (content_hash, version, response, created_at) VALUES (?, ?, ?, ?)",
+                    (content_hash, version, json.dumps(response), time.time())
+                )
+                connection.commit()
+        except Exception as e:
+            logger.warning(f"LLM cache save failed: {str(e)}")
+
+    def clear_expired(self) -> int:
+        """Delete expired entries and return the number removed"""
+        try:
+            with self._lock:
+                connection = self._get_connection()
+                cursor = connection.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?",
+                    (time.time() - self.ttl_seconds,)
+                )
+                connection.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.warning(f"LLM cache cleanup failed: {str(e)}")
+            return 0
+
+# Global instance
+llm_cache = LLMCache()
@@ -44,38 +44,59 @@ class PDFParser:
         """Extract text using pdfplumber (better formatting preservation)"""
         try:
             with pdfplumber.open(file_path) as pdf:
-                text = ""
-                metadata = {
-                    "page_count": len(pdf.pages),
-                    "extraction_method": "pdfplumber"
-                }
-                
-                # Try to get document metadata
-                if hasattr(pdf, 'metadata') and pdf.metadata:
-                    metadata.update({
-                        "title": pdf.metadata.get("Title", ""),
-                        "author": pdf.metadata.get("Author", ""),
-                        "creator": pdf.metadata.get("Creator", ""),
-                        "creation_date": str(pdf.metadata.get("CreationDate", ""))
-                    })
-                
-                for page_num, page in enumerate(pdf.pages):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text:
-                            # Preserve some structure
-                            cleaned_text = self._clean_page_text(page_text)
-                            text += f"\n--- Page {page_num + 1} ---\n{cleaned_text}\n"
-                    except Exception as e:
-                        logger.warning(f"Failed to extract text from page {page_num + 1}: {str(e)}")
-                        continue
-                
+                metadata = self._get_pdfplumber_metadata(pdf)
+                text = self._extract_pdfplumber_pages(pdf, 0, len(pdf.pages))
                 return text, metadata
                 
         except Exception as e:
             logger.error(f"pdfplumber extraction failed: {str(e)}")
             raise
     
+    def extract_text_pages(self, file_path: str, start_page: int, end_page: int) -> str:
+        """Extract text from pages [start_page, end_page) using pdfplumber (0-indexed)"""
+        with pdfplumber.open(file_path) as pdf:
+            return self._extract_pdfplumber_pages(pdf, start_page, min(end_page, len(pdf.pages)))
+    
+    def get_metadata(self, file_path: str) -> Dict[str, Any]:
+        """Get PDF metadata and page count without extracting text"""
+        with pdfplumber.open(file_path) as pdf:
+            return self._get_pdfplumber_metadata(pdf)
+    
+    def _get_pdfplumber_metadata(self, pdf) -> Dict[str, Any]:
+        """Build metadata dict for an open pdfplumber document"""
+        metadata = {
+            "page_count": len(pdf.pages),
+            "extraction_method": "pdfplumber"
+        }
+        
+        # Try to get document metadata
+        if hasattr(pdf, 'metadata') and pdf.metadata:
+            metadata.update({
+                "title": pdf.metadata.get("Title", ""),
+                "author": pdf.metadata.get("Author", ""),
+                "creator": pdf.metadata.get("Creator", ""),
+                "creation_date": str(pdf.metadata.get("CreationDate", ""))
+            })
+        
+        return metadata
+    
+    def _extract_pdfplumber_pages(self, pdf, start_page: int, end_page: int) -> str:
+        """Extract text from a page range of an open pdfplumber document"""
+        text_parts = []
+        
+        for page_num in range(start_page, end_page):
+            try:
+                page_text = pdf.pages[page_num].extract_text()
+                if page_text:
+                    # Preserve some structure
+                    cleaned_text = self._clean_page_text(page_text)
+                    text_parts.append(f"\n--- Page {page_num + 1} ---\n{cleaned_text}\n")
+            except Exception as e:
+                logger.warning(f"Failed to extract text from page {page_num + 1}: {str(e)}")
+                continue
+        
+        return "".join(text_parts)
+    
     def extract_text(self, file_path: str) -> Tuple[str, Dict[str, Any]]:
         """Extract text from PDF using the best available method"""
         if not os.path.exists(file_path):
@@ -0,0 +1,128 @@
+import os
+import time
+import asyncio
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_INDICATORS = (
+    'rate limit', 'quota exceeded', '429', 'resource_exhausted',
+    'too many requests', 'rate_limit_exceeded'
+)
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check if an error (or the error wrapped by a tenacity RetryError) is due to rate limiting"""
+    if any(term in str(error).lower() for term in RATE_LIMIT_INDICATORS):
+        return True
+
+    last_attempt = getattr(error, 'last_attempt', None)
+    if last_attempt is not None and hasattr(last_attempt, 'exception'):
+        wrapped_error = last_attempt.exception()
+        if wrapped_error and any(term in str(wrapped_error).lower() for term in RATE_LIMIT_INDICATORS):
+            return True
+
+    return False
+
+class AsyncRateLimiter:
+    """Token-bucket rate limiter allowing max_rate acquisitions per time_period, usable with `async with`.
+
+    Optionally caps the number of requests in flight, and can be paused so that all callers
+    back off together after a rate-limit response.
+    """
+
+    def __init__(self, max_rate: float, time_period: float = 60.0, max_concurrency: Optional[int] = None):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self.max_concurrency = max_concurrency
+        self._rate_per_second = max_rate / time_period
+        self._level = 0.0
+        self._last_check = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _leak(self) -> None:
+        """Drain the bucket according to the time elapsed since the last check"""
+        now = time.monotonic()
+        elapsed = now - self._last_check
+        self._level = max(0.0, self._level - elapsed * self._rate_per_second)
+        self._last_check = now
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all new acquisitions for at least the given number of seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        """Wait until a request slot is available and take it"""
+        # Created lazily so the lock and semaphore bind to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if self.max_concurrency and self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+
+        try:
+            async with self._lock:
+                while True:
+                    pause_time = self._paused_until - time.monotonic()
+                    if pause_time > 0:
+                        logger.debug(f"Rate limiter paused, waiting {pause_time:.2f}s")
+                        await asyncio.sleep(pause_time)
+                        continue
+
+                    self._leak()
+                    if self._level + 1 <= self.max_rate:
+                        self._level += 1
+                        return
+
+                    wait_time = (self._level + 1 - self.max_rate) / self._rate_per_second
+                    logger.debug(f"Rate limit reached, waiting {wait_time:.2f}s")
+                    await asyncio.sleep(wait_time)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self) -> None:
+        """Free the in-flight slot taken by acquire"""
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+class Bulkhead:
+    """Cap on the number of operations in flight, usable with `async with`"""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        # Created lazily so the semaphore binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        await self._semaphore.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+        return False
+
+# Global instance shared by all LLM requests
+llm_rate_limiter = AsyncRateLimiter(
+    max_rate=float(os.getenv("LLM_MAX_REQUESTS_PER_MINUTE", 60)),
+    time_period=60.0,
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", 4))
+)
+
+# Global cap on LLM service calls in flight across all documents, including document-level
+# calls that do not go through llm_rate_limiter
+llm_bulkhead = Bulkhead(int(os.getenv("LLM_MAX_CONCURRENT_CALLS", 16)))
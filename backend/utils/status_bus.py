@@ -0,0 +1,47 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which no further updates are published for a document
+TERMINAL_STATUSES = ("completed", "failed")
+
+class StatusBus:
+    """In-process publish/subscribe of processing status snapshots, one queue per watcher"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def publish(self, document_id: str, event: Dict[str, Any]) -> None:
+        """Push a status snapshot to everyone watching the document"""
+        for queue in self._subscribers.get(document_id, ()):
+            queue.put_nowait(event)
+
+    async def watch(self, document_id: str, get_snapshot: Optional[Callable[[], Optional[Dict[str, Any]]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield status snapshots for a document until it completes or fails.
+
+        get_snapshot is called after subscribing, so late joiners start from the
+        last known status without missing updates published in between.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[document_id].add(queue)
+
+        try:
+            event = get_snapshot() if get_snapshot else None
+            while True:
+                if event is not None:
+                    yield event
+                    if event.get("status") in TERMINAL_STATUSES:
+                        return
+                event = await queue.get()
+        finally:
+            subscribers = self._subscribers.get(document_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[document_id]
+
+# Global instance
+status_bus = StatusBus()
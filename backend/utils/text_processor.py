@@ -6,6 +6,9 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Whitespace-delimited token, matching str.split() boundaries
+WORD_PATTERN = re.compile(r'\S+')
+
 class TextProcessor:
     def __init__(self):
         # Common legal document patterns
@@ -175,8 +178,13 @@ class TextProcessor:
     
     def chunk_text(self, text: str, max_chunk_size: int = 2000, overlap: int = 200) -> List[str]:
         """Split text into overlapping chunks for AI processing"""
+        chunks, _ = self.chunk_text_with_stats(text, max_chunk_size, overlap)
+        return chunks
+    
+    def chunk_text_with_stats(self, text: str, max_chunk_size: int = 2000, overlap: int = 200) -> Tuple[List[str], int]:
+        """Split text into chunks and return them with their total character count"""
         if not text:
-            return []
+            return [], 0
         
         # First try to split by sections
         sections = self._split_by_sections(text)
@@ -205,7 +213,15 @@ class TextProcessor:
         if current_chunk:
             chunks.append(current_chunk.strip())
         
-        return [chunk for chunk in chunks if chunk.strip()]
+        # Drop empty chunks and total the sizes in the same pass
+        non_empty_chunks = []
+        total_chars = 0
+        for chunk in chunks:
+            if chunk.strip():
+                non_empty_chunks.append(chunk)
+                total_chars += len(chunk)
+        
+        return non_empty_chunks, total_chars
     
     def _split_by_sections(self, text: str) -> List[str]:
         """Split text by legal document sections"""
@@ -410,6 +426,20 @@ class TextProcessor:
         
         return min(score, 1.0)
     
+    def has_meaningful_words(self, text: str, min_count: int = 5) -> bool:
+        """Check whether text has at least min_count alphabetic words longer than 3 characters"""
+        meaningful_count = 0
+        
+        # Scan lazily so long clauses stop as soon as enough words are found
+        for match in WORD_PATTERN.finditer(text):
+            word = match.group().lower()
+            if len(word) > 3 and word.isalpha():
+                meaningful_count += 1
+                if meaningful_count >= min_count:
+                    return True
+        
+        return False
+    
     def get_word_count(self, text: str) -> int:
         """Get word count of text"""
         return len(text.split()) if text else 0